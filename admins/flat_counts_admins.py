@@ -0,0 +1,58 @@
+from sqlalchemy import case, func
+from extensions import db
+from admins.models_admins import Building, Flat, Tower
+from common.catalog_version import bump_building_version
+
+
+def adjust_flat_counts(tower_id, building_id, flats=0, available=0):
+    # Runs inside the caller's transaction; relative UPDATEs so concurrent flat writes don't lose counts.
+    # A None id skips that level (a tower being deleted only needs its building adjusted).
+    for model, entity_id in ((Tower, tower_id), (Building, building_id)):
+        if entity_id is None:
+            continue
+        model.query.filter_by(id=entity_id).update(
+            {
+                model.flats_count: model.flats_count + flats,
+                model.available_flats_count: model.available_flats_count + available,
+            },
+            synchronize_session=False,
+        )
+
+
+def _count_flats(group_column, *joins):
+    query = db.session.query(
+        group_column,
+        func.count(Flat.id),
+        func.coalesce(func.sum(case((Flat.is_available.is_(True), 1), else_=0)), 0),
+    ).select_from(Flat)
+    for target, condition in joins:
+        query = query.join(target, condition)
+    return {entity_id: (flats, available) for entity_id, flats, available in query.group_by(group_column)}
+
+
+def repair_flat_counts():
+    # Recomputes every tower's and building's counters from `flats` and fixes the ones that drifted.
+    # Returns (towers repaired, buildings repaired).
+    repaired = []
+    touched_building_ids = set()
+    targets = (
+        (Tower, Tower.building_id, _count_flats(Flat.tower_id)),
+        (Building, Building.id, _count_flats(Tower.building_id, (Tower, Tower.id == Flat.tower_id))),
+    )
+    for model, building_column, counts in targets:
+        fixed = 0
+        rows = db.session.query(model.id, building_column, model.flats_count, model.available_flats_count)
+        for entity_id, building_id, flats_count, available_flats_count in rows.all():
+            expected = counts.get(entity_id, (0, 0))
+            if (flats_count, available_flats_count) != expected:
+                model.query.filter_by(id=entity_id).update(
+                    {model.flats_count: expected[0], model.available_flats_count: expected[1]},
+                    synchronize_session=False,
+                )
+                touched_building_ids.add(building_id)
+                fixed += 1
+        repaired.append(fixed)
+    for building_id in sorted(touched_building_ids):
+        bump_building_version(building_id)
+    db.session.commit()
+    return tuple(repaired)
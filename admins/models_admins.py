@@ -14,7 +14,20 @@ class Building(db.Model):
     city = db.Column(db.String(80), nullable=False)
     state = db.Column(db.String(80), nullable=False)
     pincode = db.Column(db.String(20), nullable=False)
+    # Canonical location ids resolved from city/state; search filters compare these by equality.
+    city_id = db.Column(db.Integer, db.ForeignKey("cities.id"), nullable=True, index=True)
+    state_id = db.Column(db.Integer, db.ForeignKey("states.id"), nullable=True, index=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    # Derived from latitude/longitude; radius search prunes candidates by geohash prefix ranges.
+    geohash = db.Column(db.String(12), nullable=True, index=True)
     total_towers = db.Column(db.Integer, nullable=False, default=0)
+    # Maintained by the admin flat write paths (`flask repair-flat-counts` recomputes them).
+    flats_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    available_flats_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Catalog version of the last admin write to this building or anything under it; keys the
+    # cached public catalog responses (see `bump_building_version`).
+    inventory_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     picture_url = db.Column(db.String(512), nullable=True)
     picture_public_id = db.Column(db.String(255), nullable=True)
     picture_folder = db.Column(db.String(255), nullable=False, default=ASSET_PIC_FOLDER)
@@ -22,6 +35,50 @@ class Building(db.Model):
 
     towers = db.relationship("Tower", backref="building", lazy=True, cascade="all, delete-orphan")
     amenities = db.relationship("Amenity", backref="building", lazy=True, cascade="all, delete-orphan")
+    address_tokens = db.relationship("BuildingAddressToken", lazy=True, cascade="all, delete-orphan")
+
+
+class State(db.Model):
+    __tablename__ = "states"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    slug = db.Column(db.String(80), unique=True, nullable=False)
+
+
+class City(db.Model):
+    __tablename__ = "cities"
+    __table_args__ = (
+        db.UniqueConstraint("state_id", "slug", name="uq_city_state_slug"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    slug = db.Column(db.String(80), nullable=False)
+    state_id = db.Column(db.Integer, db.ForeignKey("states.id"), nullable=False)
+
+
+class BuildingAddressToken(db.Model):
+    __tablename__ = "building_address_tokens"
+    __table_args__ = (
+        # Serves the infix LIKE lookups of address search on PostgreSQL (requires pg_trgm).
+        db.Index(
+            "ix_building_address_tokens_token_trgm",
+            "token",
+            postgresql_using="gin",
+            postgresql_ops={"token": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+    building_id = db.Column(db.Integer, db.ForeignKey("buildings.id"), primary_key=True)
+    token = db.Column(db.String(255), primary_key=True, index=True)
+
+
+db.event.listen(
+    BuildingAddressToken.__table__,
+    "before_create",
+    db.DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
 
 
 class Tower(db.Model):
@@ -33,6 +90,9 @@ class Tower(db.Model):
     name = db.Column(db.String(50), nullable=False)
     floors = db.Column(db.Integer, nullable=False)
     total_flats = db.Column(db.Integer, nullable=False, default=0)
+    # Maintained by the admin flat write paths (`flask repair-flat-counts` recomputes them).
+    flats_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    available_flats_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     building_id = db.Column(db.Integer, db.ForeignKey("buildings.id"), nullable=False)
     picture_url = db.Column(db.String(512), nullable=True)
     picture_public_id = db.Column(db.String(255), nullable=True)
@@ -53,6 +113,13 @@ class Flat(db.Model):
     __tablename__ = "flats"
     __table_args__ = (
         db.UniqueConstraint("tower_id", "flat_number", name="uq_tower_flat"),
+        # Keyset pagination of a tower's flats seeks on (tower_id, id).
+        db.Index("ix_flats_tower_id_id", "tower_id", "id"),
+        # Flat search sort orders (newest, rent_asc/rent_desc, area_desc) under the default
+        # available_only filter, so a sorted page is an index range scan.
+        db.Index("ix_flats_available_id", "is_available", "id"),
+        db.Index("ix_flats_available_rent_id", "is_available", "rent_amount", "id"),
+        db.Index("ix_flats_available_area_id", "is_available", "area_sqft", "id"),
     )
 
     ASSET_PIC_FOLDER = "kots/assets"
@@ -70,6 +137,8 @@ class Flat(db.Model):
     picture_public_id = db.Column(db.String(255), nullable=True)
     picture_folder = db.Column(db.String(255), nullable=False, default=ASSET_PIC_FOLDER)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # OR of the amenity_bits bits of this flat's amenity names; see users/amenities_users.py.
+    amenity_mask = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
 
     amenities = db.relationship(
         "Amenity",
@@ -94,6 +163,16 @@ class Amenity(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 
+class AmenityBit(db.Model):
+    # Bit position of a normalized amenity name in Flat.amenity_mask. Assigned on first use and never
+    # reused, so a stale per-worker copy of this table can miss bits but never map a name to a wrong one.
+    __tablename__ = "amenity_bits"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), unique=True, nullable=False)
+    bit = db.Column(db.SmallInteger, unique=True, nullable=False)
+
+
 class Booking(db.Model):
     __tablename__ = "bookings"
 
@@ -112,3 +191,27 @@ class Booking(db.Model):
     building_full_address = db.Column(db.String(255), nullable=True)
     user_name = db.Column(db.String(120), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BookingCounter(db.Model):
+    # Booking activity per flat or building per day, maintained by the booking write paths so
+    # ranking never has to count rows in `bookings`.
+    __tablename__ = "booking_counters"
+    __table_args__ = (
+        db.UniqueConstraint("kind", "entity_id", "bucket", name="uq_booking_counter_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.Date, nullable=False, index=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    approvals = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CatalogVersion(db.Model):
+    __tablename__ = "catalog_versions"
+
+    scope = db.Column(db.String(40), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
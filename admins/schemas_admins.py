@@ -1,3 +1,6 @@
+from common.cache import image_url
+
+
 def serialize_admins_health():
     return {"service": "admins"}
 
@@ -6,6 +9,30 @@ def serialize_admins_dashboard():
     return {"scope": "admin"}
 
 
+def _validate_coordinates(payload, errors):
+    # Returns (latitude, longitude); both None when neither is given (or both are cleared).
+    raw_latitude = payload.get("latitude")
+    raw_longitude = payload.get("longitude")
+    if raw_latitude in (None, "") and raw_longitude in (None, ""):
+        return None, None
+    if raw_latitude in (None, "") or raw_longitude in (None, ""):
+        errors.append("latitude and longitude must be provided together.")
+        return None, None
+
+    try:
+        latitude = float(raw_latitude)
+        longitude = float(raw_longitude)
+    except (TypeError, ValueError):
+        errors.append("latitude and longitude must be numbers.")
+        return None, None
+
+    if latitude < -90 or latitude > 90:
+        errors.append("latitude must be between -90 and 90.")
+    if longitude < -180 or longitude > 180:
+        errors.append("longitude must be between -180 and 180.")
+    return latitude, longitude
+
+
 def validate_building_create_payload(payload):
     errors = []
     payload = payload or {}
@@ -27,6 +54,7 @@ def validate_building_create_payload(payload):
         errors.append("State is required.")
     if not pincode:
         errors.append("Pincode is required.")
+    latitude, longitude = _validate_coordinates(payload, errors)
 
     if errors:
         return None, errors
@@ -38,6 +66,8 @@ def validate_building_create_payload(payload):
         "state": state.strip(),
         "pincode": str(pincode).strip(),
         "total_towers": total_towers,
+        "latitude": latitude,
+        "longitude": longitude,
     }, None
 
 
@@ -61,6 +91,8 @@ def validate_building_update_payload(payload):
             if key in {"name", "address", "city", "state", "pincode"} and isinstance(value, str):
                 value = value.strip()
             data[key] = value
+    if "latitude" in payload or "longitude" in payload:
+        data["latitude"], data["longitude"] = _validate_coordinates(payload, errors)
 
     if not data:
         errors.append("At least one field is required.")
@@ -80,8 +112,10 @@ def serialize_building(building):
         "city": building.city,
         "state": building.state,
         "pincode": building.pincode,
+        "latitude": building.latitude,
+        "longitude": building.longitude,
         "total_towers": building.total_towers,
-        "picture_url": building.picture_url,
+        "picture_url": image_url(building.picture_url),
         "picture_public_id": building.picture_public_id,
         "picture_folder": building.picture_folder,
         "created_at": building.created_at.isoformat(),
@@ -118,7 +152,7 @@ def serialize_tower(tower):
         "name": tower.name,
         "floors": tower.floors,
         "total_flats": tower.total_flats,
-        "picture_url": tower.picture_url,
+        "picture_url": image_url(tower.picture_url),
         "picture_public_id": tower.picture_public_id,
         "picture_folder": tower.picture_folder,
         "created_at": tower.created_at.isoformat(),
@@ -133,7 +167,7 @@ def serialize_tower_with_building(tower):
         "name": tower.name,
         "floors": tower.floors,
         "total_flats": tower.total_flats,
-        "picture_url": tower.picture_url,
+        "picture_url": image_url(tower.picture_url),
         "picture_public_id": tower.picture_public_id,
         "picture_folder": tower.picture_folder,
         "created_at": tower.created_at.isoformat(),
@@ -190,7 +224,7 @@ def serialize_flat(flat):
         "rent_amount": str(flat.rent_amount),
         "security_deposit": str(flat.security_deposit),
         "is_available": flat.is_available,
-        "picture_url": flat.picture_url,
+        "picture_url": image_url(flat.picture_url),
         "picture_public_id": flat.picture_public_id,
         "picture_folder": flat.picture_folder,
         "amenity_ids": [amenity.id for amenity in flat.amenities] if hasattr(flat, "amenities") else [],
@@ -280,7 +314,7 @@ def serialize_amenity(amenity):
         "building_id": amenity.building_id,
         "name": amenity.name,
         "description": amenity.description,
-        "picture_url": amenity.picture_url,
+        "picture_url": image_url(amenity.picture_url),
         "picture_public_id": amenity.picture_public_id,
         "picture_folder": amenity.picture_folder,
         "created_at": amenity.created_at.isoformat(),
@@ -4,6 +4,27 @@ import cloudinary.uploader
 from extensions import db
 from common.image_compression import compress_image_to_100kb
 from admins.models_admins import Building, Tower, Flat, Amenity, Booking
+from users.search_users import sync_building_address_tokens
+from common.catalog_version import (
+    AMENITIES_SCOPE,
+    BUILDINGS_SCOPE,
+    FLATS_SCOPE,
+    bump_building_version,
+    bump_catalog_version,
+)
+from users.suggest_users import refresh_building_suggestions, remove_building_suggestions
+from users.geo_users import geohash_encode
+from common.locations import assign_building_location
+from users.amenities_users import (
+    refresh_amenity_name,
+    refresh_flat_amenity_names,
+    remove_amenity_name,
+    sync_flat_amenity_masks,
+)
+from users.similar_users import refresh_similar_flats
+from users.saved_searches_users import percolate_building, percolate_flat
+from users.popularity_users import count_booking_activity, refresh_booking_popularity
+from admins.flat_counts_admins import adjust_flat_counts
 from admins.schemas_admins import (
     serialize_admins_health,
     serialize_admins_dashboard,
@@ -124,6 +145,12 @@ def admins_dashboard_service():
 
 
 
+def _set_building_location(building, latitude, longitude):
+    building.latitude = latitude
+    building.longitude = longitude
+    building.geohash = geohash_encode(latitude, longitude) if latitude is not None else None
+
+
 #create building with admin id, payload, file and folder(form data) and return building details or error
 def create_building_service(admin_id, payload, file, folder):
     # Service: Create a building (optionally with image upload) for a given admin.
@@ -140,6 +167,8 @@ def create_building_service(admin_id, payload, file, folder):
         pincode=payload["pincode"],
         total_towers=_parse_int(payload.get("total_towers")) or 0,
     )
+    _set_building_location(building, payload["latitude"], payload["longitude"])
+    assign_building_location(building)
 
     picture_url, public_id, target_folder, err = _upload_image(
         file,
@@ -154,8 +183,13 @@ def create_building_service(admin_id, payload, file, folder):
         building.picture_public_id = public_id
         building.picture_folder = target_folder
 
+    sync_building_address_tokens(building)
+    bump_catalog_version()
+    bump_catalog_version(BUILDINGS_SCOPE)
+    building.inventory_version = bump_building_version()
     db.session.add(building)
     db.session.commit()
+    refresh_building_suggestions(building)
 
     return {
         "status_code": 201,
@@ -181,6 +215,7 @@ def update_building_service(building_id, payload, file, folder):
         building.name = payload["name"]
     if "address" in payload and payload.get("address"):
         building.address = payload["address"]
+        sync_building_address_tokens(building)
     if "city" in payload and payload.get("city"):
         building.city = payload["city"]
     if "state" in payload and payload.get("state"):
@@ -192,6 +227,16 @@ def update_building_service(building_id, payload, file, folder):
         if parsed is None:
             return None, _error(400, "Validation Error", "total_towers must be an integer.")
         building.total_towers = parsed
+    if "latitude" in payload:
+        _set_building_location(building, payload["latitude"], payload["longitude"])
+    # Saved searches filter on these, so the building's flats are percolated again after the commit.
+    repercolate = bool(payload.get("address") or payload.get("city") or payload.get("state") or "latitude" in payload)
+    relocated_flat_ids = []
+    if payload.get("city") or payload.get("state"):
+        assign_building_location(building)
+        relocated_flat_ids = [
+            flat_id for (flat_id,) in db.session.query(Flat.id).join(Tower).filter(Tower.building_id == building.id)
+        ]
 
     old_public_id = building.picture_public_id
     picture_url, public_id, target_folder, err = _upload_image(
@@ -207,7 +252,16 @@ def update_building_service(building_id, payload, file, folder):
         building.picture_public_id = public_id
         building.picture_folder = target_folder
 
+    bump_catalog_version()
+    bump_catalog_version(BUILDINGS_SCOPE)
+    bump_building_version(building.id)
+    if relocated_flat_ids:
+        bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_building_suggestions(building)
+    refresh_similar_flats(relocated_flat_ids)
+    if repercolate:
+        percolate_building(building)
 
     _maybe_destroy_old_image(old_public_id, building.picture_public_id, bool(file))
 
@@ -241,16 +295,24 @@ def delete_building_service(admin_id, building_id):
     for amenity in amenities:
         asset_public_ids.append(amenity.picture_public_id)
 
+    flat_ids = []
     towers = Tower.query.filter_by(building_id=building.id).all()
     for tower in towers:
         asset_public_ids.append(tower.picture_public_id)
         flats = Flat.query.filter_by(tower_id=tower.id).all()
         for flat in flats:
             asset_public_ids.append(flat.picture_public_id)
+            flat_ids.append(flat.id)
 
     building_name = building.name
     db.session.delete(building)
+    bump_catalog_version()
+    bump_catalog_version(BUILDINGS_SCOPE)
+    bump_catalog_version(FLATS_SCOPE)
+    bump_building_version()
     db.session.commit()
+    remove_building_suggestions(building_id)
+    refresh_similar_flats(flat_ids)
 
     _destroy_cloudinary_assets(asset_public_ids)
 
@@ -367,7 +429,13 @@ def create_flat_service(admin_id, tower_id, payload, file, folder):
         flat.picture_folder = target_folder
 
     db.session.add(flat)
+    adjust_flat_counts(tower.id, tower.building_id, flats=1, available=int(bool(is_available)))
+    bump_building_version(tower.building_id)
+    bump_catalog_version()
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_similar_flats([flat.id])
+    percolate_flat(flat)
 
     return {
         "status_code": 201,
@@ -425,7 +493,14 @@ def update_flat_service(admin_id, flat_id, payload, file, folder):
         is_available = payload.get("is_available")
         if isinstance(is_available, str):
             is_available = is_available.lower() in ("true", "1", "t", "yes")
-        flat.is_available = bool(is_available)
+        is_available = bool(is_available)
+        if is_available != flat.is_available:
+            adjust_flat_counts(
+                flat.tower_id,
+                flat.tower.building_id,
+                available=1 if is_available else -1,
+            )
+        flat.is_available = is_available
 
     old_public_id = flat.picture_public_id
     picture_url, public_id, target_folder, err = _upload_image(
@@ -441,7 +516,12 @@ def update_flat_service(admin_id, flat_id, payload, file, folder):
         flat.picture_public_id = public_id
         flat.picture_folder = target_folder
 
+    bump_building_version(flat.tower.building_id)
+    bump_catalog_version()
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_similar_flats([flat.id])
+    percolate_flat(flat)
 
     _maybe_destroy_old_image(old_public_id, flat.picture_public_id, bool(file))
 
@@ -565,6 +645,7 @@ def create_amenity_service(admin_id, building_id, payload, file, folder):
         amenity.picture_folder = target_folder
 
     db.session.add(amenity)
+    bump_building_version(building.id)
     db.session.commit()
 
     return {
@@ -621,6 +702,7 @@ def update_amenity_service(admin_id, amenity_id, payload, file, folder):
     if not amenity.building or amenity.building.admin_id != admin_id:
         return None, _error(403, "Forbidden", "You can only update amenities for your own buildings.")
 
+    renamed = "name" in payload and payload["name"] != amenity.name
     if "name" in payload:
         amenity.name = payload["name"]
     if "description" in payload:
@@ -640,7 +722,19 @@ def update_amenity_service(admin_id, amenity_id, payload, file, folder):
         amenity.picture_public_id = public_id
         amenity.picture_folder = target_folder
 
+    bump_building_version(amenity.building_id)
+    renamed_flat_ids = []
+    if renamed:
+        renamed_flat_ids = [flat.id for flat in amenity.flats]
+        db.session.flush()
+        sync_flat_amenity_masks(renamed_flat_ids)
+        bump_catalog_version()
+        bump_catalog_version(AMENITIES_SCOPE)
+        bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    if renamed:
+        refresh_amenity_name(amenity)
+        refresh_similar_flats(renamed_flat_ids)
 
     _maybe_destroy_old_image(old_public_id, amenity.picture_public_id, bool(file))
 
@@ -680,7 +774,16 @@ def set_flat_amenities_service(admin_id, flat_id, payload):
         return None, _error(400, "Validation Error", "One or more amenities are invalid for this building.")
 
     flat.amenities = amenities
+    db.session.flush()
+    sync_flat_amenity_masks([flat.id])
+    bump_building_version(flat.tower.building_id)
+    bump_catalog_version()
+    bump_catalog_version(AMENITIES_SCOPE)
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_flat_amenity_names(flat)
+    refresh_similar_flats([flat.id])
+    percolate_flat(flat)
 
     return {
         "status_code": 200,
@@ -712,9 +815,18 @@ def delete_amenity_service(admin_id, amenity_id):
     old_public_id = amenity.picture_public_id
     amenity_id_value = amenity.id
     amenity_name = amenity.name
+    flat_ids = [flat.id for flat in amenity.flats]
 
+    bump_building_version(amenity.building_id)
     db.session.delete(amenity)
+    db.session.flush()
+    sync_flat_amenity_masks(flat_ids)
+    bump_catalog_version()
+    bump_catalog_version(AMENITIES_SCOPE)
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    remove_amenity_name(amenity_id_value)
+    refresh_similar_flats(flat_ids)
 
     _destroy_cloudinary_assets([old_public_id])
 
@@ -746,10 +858,21 @@ def delete_tower_service(admin_id, tower_id):
     flats = Flat.query.filter_by(tower_id=tower.id).all()
     for flat in flats:
         asset_public_ids.append(flat.picture_public_id)
+    flat_ids = [flat.id for flat in flats]
 
     tower_id_value = tower.id
+    adjust_flat_counts(
+        None,
+        tower.building_id,
+        flats=-len(flats),
+        available=-sum(1 for flat in flats if flat.is_available),
+    )
+    bump_building_version(tower.building_id)
     db.session.delete(tower)
+    bump_catalog_version()
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_similar_flats(flat_ids)
 
     _destroy_cloudinary_assets(asset_public_ids)
 
@@ -779,8 +902,18 @@ def delete_flat_service(admin_id, flat_id):
 
     old_public_id = flat.picture_public_id
     flat_id_value = flat.id
+    adjust_flat_counts(
+        flat.tower_id,
+        flat.tower.building_id,
+        flats=-1,
+        available=-1 if flat.is_available else 0,
+    )
+    bump_building_version(flat.tower.building_id)
     db.session.delete(flat)
+    bump_catalog_version()
+    bump_catalog_version(FLATS_SCOPE)
     db.session.commit()
+    refresh_similar_flats([flat_id_value])
 
     _destroy_cloudinary_assets([old_public_id])
 
@@ -839,6 +972,7 @@ def create_tower_service(admin_id, building_id, payload, file, folder):
         tower.picture_folder = target_folder
 
     db.session.add(tower)
+    bump_building_version(building.id)
     db.session.commit()
 
     return {
@@ -896,6 +1030,7 @@ def update_tower_service(admin_id, tower_id, payload, file, folder):
         tower.picture_public_id = public_id
         tower.picture_folder = target_folder
 
+    bump_building_version(tower.building_id)
     db.session.commit()
 
     _maybe_destroy_old_image(old_public_id, tower.picture_public_id, bool(file))
@@ -1033,8 +1168,14 @@ def update_admin_booking_status_service(admin_id, booking_id, payload):
     if status not in ("PENDING", "APPROVED", "DECLINED"):
         return None, _error(400, "Validation Error", "status must be PENDING, APPROVED, or DECLINED.")
 
+    # Approvals count as booking activity for search popularity; revoking one takes it back.
+    approvals = int(status == "APPROVED") - int(booking.status == "APPROVED")
     booking.status = status
+    if approvals:
+        count_booking_activity(booking, approvals=approvals)
     db.session.commit()
+    if approvals:
+        refresh_booking_popularity(booking, approvals=approvals)
 
     return {
         "status_code": 200,
@@ -7,11 +7,12 @@ from extensions import db, migrate, jwt
 # Import models so Alembic sees them for migrations
 from admins import models_admins  # noqa: F401
 from users import models_users  # noqa: F401
-from users.models_users import RevokedToken
+from users.revoked_tokens_users import revoked_token_cache
 from master.routes_master import master_bp
 from admins.routes_admins import admins_bp
 from users.routes_users import users_bp
 from common.error_handlers import register_error_handlers
+from common.cli import register_cli_commands
 from common.cache import apply_get_image_cache_headers
 from common.frontend_cache import apply_frontend_asset_cache_headers
 from common.response import success_response, error_response
@@ -40,7 +41,7 @@ def create_app():
         jti = jwt_payload.get("jti")
         if not jti:
             return True
-        return RevokedToken.query.filter_by(jti=jti).first() is not None
+        return revoked_token_cache.is_revoked(jti)
 
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
@@ -61,6 +62,7 @@ def create_app():
         return apply_get_image_cache_headers(response)
 
     register_error_handlers(app)
+    register_cli_commands(app)
 
     @app.route("/")
     def home():
@@ -0,0 +1,141 @@
+"""Microbenchmark for the address search scoring loop.
+
+Compares the per-call scoring path (tuning rebuilt from config for every word
+pair, addresses re-tokenized on every request) with the compiled AddressScorer,
+inside an app context so config lookups cost what they do in a request. Fuzzy
+expansion is switched off for that part because it reads the token index from
+the database; the fuzzy vocabulary lookup is timed separately against a linear
+edit-distance scan over the same synthetic vocabulary.
+
+    python benchmarks/bench_address_scoring.py [buildings] [rounds]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from config import Config  # noqa: E402
+from users.fuzzy_users import AddressVocabulary, edit_distance  # noqa: E402
+from users.search_users import (  # noqa: E402
+    AddressScorer,
+    search_tuning,
+    single_word_score,
+    tokenize_words,
+)
+
+
+WORDS = [
+    "main", "road", "mg", "nagar", "bangalore", "indiranagar", "koramangala", "whitefield",
+    "hsr", "layout", "sector", "lane", "cross", "phase", "park", "street", "hebbal",
+    "jayanagar", "btm", "stage", "1st", "2nd", "block", "ring", "outer", "residency",
+]
+QUERIES = ["mg road", "koramangala 5th block", "outer ring road", "nagar", "hsr layout sector 2"]
+TYPOS = ["banglore", "koramangla", "whitefeild", "indranagar", "jayanagr", "residancy"]
+
+
+def _uncached_score(search_address, candidate_address):
+    query_words = tokenize_words(search_address)
+    address_words = tokenize_words(candidate_address)
+    if not query_words or not address_words:
+        return 0.0
+    per_word_scores = []
+    for query_word in query_words:
+        best = 0.0
+        for address_word in address_words:
+            score = single_word_score(query_word, address_word)
+            if score > best:
+                best = score
+        per_word_scores.append(best)
+    return sum(per_word_scores) / len(per_word_scores)
+
+
+def _run_uncached(rows):
+    min_include = search_tuning()["min_include"]
+    for query in QUERIES:
+        for _, address in rows:
+            if _uncached_score(query, address) < min_include:
+                continue
+
+
+def _run_compiled(rows):
+    for query in QUERIES:
+        scorer = AddressScorer(query)
+        for building_id, address in rows:
+            scorer.includes(scorer.score(address, building_id))
+
+
+def _time(fn, rows, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(rows)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _bench_vocabulary(rnd, size, rounds):
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    terms = set(WORDS)
+    while len(terms) < size:
+        terms.add("".join(rnd.choice(alphabet) for _ in range(rnd.randint(4, 12))))
+    vocabulary = AddressVocabulary(terms, 2)
+
+    def lookup(_):
+        for word in TYPOS:
+            vocabulary.lookup(word, 2)
+
+    def scan(_):
+        for word in TYPOS:
+            [term for term in terms if term != word and edit_distance(word, term, 2) <= 2]
+
+    for word in TYPOS:
+        assert vocabulary.lookup(word, 2) == {
+            term for term in terms if term != word and edit_distance(word, term, 2) <= 2
+        }
+
+    indexed = _time(lookup, None, rounds)
+    linear = _time(scan, None, rounds)
+    print(f"vocabulary={size} typo queries={len(TYPOS)}")
+    print(f"linear scan: {linear * 1000 / len(TYPOS):8.2f} ms/word")
+    print(f"deletions:   {indexed * 1000 / len(TYPOS):8.2f} ms/word")
+    print(f"speedup:     {linear / indexed:8.1f}x")
+
+
+def main():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["ADDRESS_SCORE_FUZZY"] = 0
+    with app.app_context():
+        _bench()
+    _bench_vocabulary(random.Random(7), 20000, 3)
+
+
+def _bench():
+    buildings = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rnd = random.Random(42)
+    rows = [
+        (building_id, " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 8))))
+        for building_id in range(1, buildings + 1)
+    ]
+
+    for query in QUERIES:
+        scorer = AddressScorer(query)
+        for building_id, address in rows:
+            assert scorer.score(address, building_id) == _uncached_score(query, address)
+
+    uncached = _time(_run_uncached, rows, rounds)
+    compiled = _time(_run_compiled, rows, rounds)
+    per_query = len(QUERIES)
+    print(f"buildings={buildings} queries={per_query} rounds={rounds}")
+    print(f"uncached: {uncached * 1000 / per_query:8.2f} ms/query")
+    print(f"compiled: {compiled * 1000 / per_query:8.2f} ms/query")
+    print(f"speedup:  {uncached / compiled:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Microbenchmark for the GET cache-header hook on /users/buildings payloads.
+
+Serializes synthetic buildings the way GET /users/buildings does and times the
+hook's image decision both ways. The old way decodes the JSON body the route
+just encoded and walks it for picture URLs. The new way reads the metadata the
+serializers declared on flask.g. Payloads without images are the worst case
+for the walk, because it has to visit every node. Sizes default to one page
+(20), the largest page (100) and the old unpaginated list (1000).
+
+    python benchmarks/bench_cache_hook.py [rounds] [sizes...]
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+from config import Config  # noqa: E402
+from common.cache import apply_get_image_cache_headers, response_cache_metadata  # noqa: E402
+from users.schemas_users import serialize_building_list_response  # noqa: E402
+
+
+IMAGE_URL_KEYS = {"picture_url", "profile_pic_url"}
+
+
+def _legacy_contains_image_urls(value):
+    if isinstance(value, dict):
+        for key, nested_value in value.items():
+            if key in IMAGE_URL_KEYS and isinstance(nested_value, str) and nested_value.strip():
+                return True
+            if _legacy_contains_image_urls(nested_value):
+                return True
+        return False
+    if isinstance(value, list):
+        return any(_legacy_contains_image_urls(item) for item in value)
+    return False
+
+
+def _building(building_id, picture_url):
+    amenities = [
+        SimpleNamespace(name=f"Amenity {index}", description="24x7 access for residents", picture_url=None)
+        for index in range(6)
+    ]
+    return SimpleNamespace(
+        id=building_id,
+        name=f"Residency {building_id}",
+        address=f"{building_id} Outer Ring Road, Sector 2",
+        city="Bengaluru",
+        state="Karnataka",
+        pincode="560103",
+        latitude=12.93,
+        longitude=77.69,
+        total_towers=3,
+        picture_url=picture_url,
+        towers=[SimpleNamespace(id=index) for index in range(3)],
+        flats_count=120,
+        available_flats_count=37,
+        amenities=amenities,
+    )
+
+
+def _time(fn, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sizes = [int(size) for size in sys.argv[2:]] or [20, 100, 1000]
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    print(f"rounds={rounds}")
+    for size in sizes:
+        for label, picture_url in (("no images", None), ("images", "https://res.cloudinary.com/demo/b.jpg")):
+            buildings = [_building(building_id, picture_url) for building_id in range(size, 0, -1)]
+            with app.test_request_context("/users/buildings", method="GET"):
+                data = serialize_building_list_response(buildings, 1, size, size, 1, None)
+                response = jsonify({"status_code": 200, "data": data})
+                flagged = bool(response_cache_metadata().get("images"))
+
+                def legacy():
+                    payload = response.get_json(silent=True)
+                    return _legacy_contains_image_urls(payload.get("data"))
+
+                def declared():
+                    return bool(response_cache_metadata().get("images"))
+
+                assert legacy() == declared() == flagged
+                legacy_time = _time(legacy, rounds)
+                declared_time = _time(declared, rounds)
+                # With images the hook still hashes the body for its ETag, as before.
+                hook_time = _time(lambda: apply_get_image_cache_headers(response), rounds)
+
+            body_kb = len(response.get_data()) / 1024
+            print(
+                f"buildings={size:5d} {label:9s} body={body_kb:8.1f} KB  "
+                f"parse+walk={legacy_time * 1e6:9.1f} us  declared={declared_time * 1e6:6.2f} us  "
+                f"hook now={hook_time * 1e6:8.1f} us  saved/request={(legacy_time - declared_time) * 1e6:9.1f} us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,30 @@
-from flask import current_app, request
+from flask import current_app, g, request
 
 
-IMAGE_URL_KEYS = {"picture_url", "profile_pic_url"}
 MODULE_PREFIXES = ("/users", "/admins", "/master")
 
 
-def _contains_image_urls(value):
-    if isinstance(value, dict):
-        for key, nested_value in value.items():
-            if (
-                isinstance(key, str)
-                and key in IMAGE_URL_KEYS
-                and isinstance(nested_value, str)
-                and nested_value.strip()
-            ):
-                return True
-            if _contains_image_urls(nested_value):
-                return True
-        return False
+def declare_response_cache(images=False, scope=None, max_age=None):
+    # Services and serializers describe the payload while they build it, so the after_request hook
+    # decides from flask.g instead of decoding and walking the body.
+    meta = g.setdefault("response_cache", {})
+    if images:
+        meta["images"] = True
+    if scope:
+        meta["scope"] = scope
+    if max_age is not None:
+        meta["max_age"] = int(max_age)
 
-    if isinstance(value, list):
-        for item in value:
-            if _contains_image_urls(item):
-                return True
-        return False
 
-    return False
+def response_cache_metadata():
+    return g.get("response_cache") or {}
+
+
+def image_url(url):
+    # Serializers emit every picture URL through this so image-bearing payloads are flagged.
+    if isinstance(url, str) and url.strip():
+        declare_response_cache(images=True)
+    return url
 
 
 def apply_get_image_cache_headers(response):
@@ -38,20 +37,21 @@ def apply_get_image_cache_headers(response):
     if response.status_code != 200 or not response.is_json:
         return response
 
-    payload = response.get_json(silent=True)
-    if not isinstance(payload, dict):
+    # Streamed bodies are never buffered here; reading them would defeat the streaming.
+    if response.is_streamed:
         return response
 
-    if not _contains_image_urls(payload.get("data")):
+    meta = response_cache_metadata()
+    if not meta.get("images"):
         return response
 
-    max_age = int(current_app.config.get("IMAGE_GET_CACHE_MAX_AGE", 300))
+    max_age = meta.get("max_age", int(current_app.config.get("IMAGE_GET_CACHE_MAX_AGE", 300)))
     stale_while_revalidate = int(
         current_app.config.get("IMAGE_GET_CACHE_STALE_WHILE_REVALIDATE", 120)
     )
 
     response.headers["Cache-Control"] = (
-        f"private, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+        f"{meta.get('scope', 'private')}, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
     )
     response.vary.add("Authorization")
     response.add_etag()
@@ -0,0 +1,116 @@
+import threading
+import time
+from flask import current_app
+from extensions import db
+from admins.models_admins import Building, CatalogVersion
+
+
+# Bumped by every admin write that changes searchable inventory (buildings, towers, flats).
+INVENTORY_SCOPE = "inventory"
+# Bumped only by building create/update/delete (names, cities, states, addresses).
+BUILDINGS_SCOPE = "buildings"
+# Bumped by amenity renames/deletes and flat amenity assignments.
+AMENITIES_SCOPE = "amenities"
+# Bumped by every write that changes a flat's similarity features (the flat itself, its amenities,
+# its building's city) or removes flats.
+FLATS_SCOPE = "flats"
+# Bumped when users create or delete saved searches.
+SAVED_SEARCHES_SCOPE = "saved_searches"
+# Bumped by booking creation and booking status changes (popularity counters).
+BOOKINGS_SCOPE = "bookings"
+# Bumped by every admin write to a building or anything under it (towers, flats, amenities); keys
+# the cached catalog-wide responses, and stamps the written building's `inventory_version`.
+CATALOG_SCOPE = "catalog"
+# Bumped by role changes and by creating or deleting admin/master accounts.
+ROLES_SCOPE = "roles"
+
+
+def current_catalog_version(scope=INVENTORY_SCOPE):
+    version = db.session.query(CatalogVersion.version).filter_by(scope=scope).scalar()
+    return version or 0
+
+
+def bump_catalog_version(scope=INVENTORY_SCOPE):
+    # Runs inside the caller's transaction, so the bump commits together with the write.
+    updated = CatalogVersion.query.filter_by(scope=scope).update(
+        {CatalogVersion.version: CatalogVersion.version + 1},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.session.add(CatalogVersion(scope=scope, version=1))
+    CatalogVersionedIndex.invalidate_scope(scope)
+
+
+def bump_building_version(building_id=None):
+    # Runs inside the caller's transaction. The building is stamped with the new catalog-wide version
+    # rather than its own count, so a building id reused after a delete never repeats an old version.
+    # Returns the version, for stamping a building that has not been flushed yet.
+    bump_catalog_version(CATALOG_SCOPE)
+    version = current_catalog_version(CATALOG_SCOPE)
+    if building_id is not None:
+        Building.query.filter_by(id=building_id).update(
+            {Building.inventory_version: version},
+            synchronize_session=False,
+        )
+    return version
+
+
+def current_building_version(building_id):
+    # None when the building does not exist.
+    return db.session.query(Building.inventory_version).filter_by(id=building_id).scalar()
+
+
+class CatalogVersionedIndex:
+    # Per-worker in-memory structure built by `build()` and rebuilt once the inventory version moves.
+    # The version is re-read at most every CATALOG_VERSION_CHECK_SECONDS, so hot paths rarely hit
+    # the database; writes made by this worker mark every index stale right away unless the index
+    # opts out and patches itself through `apply()` instead.
+    _instances = []
+
+    def __init__(self, build, scope=INVENTORY_SCOPE, invalidate_on_write=True):
+        self._build = build
+        self._scope = scope
+        self._invalidate_on_write = invalidate_on_write
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        CatalogVersionedIndex._instances.append(self)
+
+    def get(self):
+        interval = float(current_app.config.get("CATALOG_VERSION_CHECK_SECONDS", 5))
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None and now - self._checked_at < interval:
+                return self._value
+            version = current_catalog_version(self._scope)
+            if self._value is None or version != self._version:
+                self._value = self._build()
+                self._version = version
+            self._checked_at = now
+            return self._value
+
+    def apply(self, update):
+        # Patches the built value in place after this worker committed a write that bumped the
+        # version once. If the version moved further, another worker wrote too, so rebuild instead.
+        with self._lock:
+            if self._value is None:
+                return
+            version = current_catalog_version(self._scope)
+            if version == (self._version or 0) + 1:
+                update(self._value)
+                self._version = version
+            else:
+                self._value = None
+                self._version = None
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._version = None
+
+    @classmethod
+    def invalidate_scope(cls, scope=INVENTORY_SCOPE):
+        for index in cls._instances:
+            if index._scope == scope and index._invalidate_on_write:
+                index.invalidate()
@@ -0,0 +1,50 @@
+import click
+from extensions import db
+from users.search_users import rebuild_address_token_index
+from common.locations import backfill_building_locations
+from admins.flat_counts_admins import repair_flat_counts
+from users.amenities_users import repair_amenity_masks
+from master.services_master import change_user_role
+from users.revoked_tokens_users import prune_revoked_tokens
+
+
+def register_cli_commands(app):
+    @app.cli.command("reindex-addresses")
+    def reindex_addresses():
+        """Rebuild the building address token index used by address search."""
+        count = rebuild_address_token_index()
+        click.echo(f"Indexed addresses for {count} buildings.")
+
+    @app.cli.command("backfill-locations")
+    def backfill_locations():
+        """Link buildings without canonical city/state rows to them, creating the rows as needed."""
+        count = backfill_building_locations()
+        click.echo(f"Backfilled locations for {count} buildings.")
+
+    @app.cli.command("repair-flat-counts")
+    def repair_flat_counts_command():
+        """Recompute tower and building flat counters from the flats table."""
+        towers, buildings = repair_flat_counts()
+        click.echo(f"Repaired flat counts for {towers} towers and {buildings} buildings.")
+
+    @app.cli.command("repair-amenity-masks")
+    def repair_amenity_masks_command():
+        """Recompute every flat's amenity bitmask from its assigned amenities."""
+        count = repair_amenity_masks()
+        click.echo(f"Repaired amenity masks for {count} flats.")
+
+    @app.cli.command("set-role")
+    @click.argument("email")
+    @click.argument("role", type=click.Choice(["user", "admin", "master"]))
+    def set_role(email, role):
+        """Change a user's role; tokens issued under the old role are re-checked until the next login."""
+        user, err = change_user_role(email, role)
+        if err:
+            raise click.ClickException(err)
+        click.echo(f"{user.email} is now {role} (role version {user.role_version}).")
+
+    @app.cli.command("prune-revoked-tokens")
+    def prune_revoked_tokens_command():
+        """Delete revoked-token rows older than the access token lifetime."""
+        count = prune_revoked_tokens()
+        click.echo(f"Pruned {count} expired revoked tokens.")
@@ -0,0 +1,114 @@
+import re
+import threading
+from collections import OrderedDict
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from admins.models_admins import Building, City, State
+from common.catalog_version import BUILDINGS_SCOPE, CatalogVersionedIndex, bump_catalog_version
+
+
+LOCATION_RESOLVE_CACHE_SIZE = 4096
+
+
+def location_slug(value):
+    return "-".join(re.findall(r"[a-z0-9]+", str(value or "").lower()))
+
+
+def _get_or_create(model, name, **key):
+    # Slugs are unique, so a concurrent writer creating the same row makes our insert fail; the insert
+    # runs in a savepoint so only it is rolled back, and the winner's row is selected instead.
+    row = model.query.filter_by(**key).first()
+    if row is not None:
+        return row
+    try:
+        with db.session.begin_nested():
+            row = model(name=name.strip(), **key)
+            db.session.add(row)
+    except IntegrityError:
+        return model.query.filter_by(**key).one()
+    return row
+
+
+def _get_or_create_state(name):
+    return _get_or_create(State, name, slug=location_slug(name))
+
+
+def _get_or_create_city(name, state):
+    return _get_or_create(City, name, state_id=state.id, slug=location_slug(name))
+
+
+def assign_building_location(building):
+    # Resolves the building's free-text city/state to canonical rows, creating them on first use.
+    state = _get_or_create_state(building.state)
+    building.state_id = state.id
+    building.city_id = _get_or_create_city(building.city, state).id
+
+
+def backfill_building_locations():
+    count = 0
+    buildings = Building.query.filter(
+        db.or_(Building.city_id.is_(None), Building.state_id.is_(None))
+    ).all()
+    for building in buildings:
+        assign_building_location(building)
+        count += 1
+    bump_catalog_version(BUILDINGS_SCOPE)
+    db.session.commit()
+    return count
+
+
+class LocationAliasMap:
+    # Every distinct free-text city/state spelling stored on buildings, with its canonical id.
+    # User input resolves to canonical ids once (cached per input) and filters become
+    # `city_id IN (...)`. Matching keeps the old case-insensitive substring semantics.
+    def __init__(self, city_aliases, state_aliases, complete):
+        self.complete = complete
+        self._aliases = {"city": city_aliases, "state": state_aliases}
+        self._resolved = {"city": OrderedDict(), "state": OrderedDict()}
+        self._lock = threading.Lock()
+
+    def resolve(self, kind, value):
+        needle = str(value or "").strip().lower()
+        resolved = self._resolved[kind]
+        with self._lock:
+            ids = resolved.get(needle)
+            if ids is not None:
+                resolved.move_to_end(needle)
+                return ids
+        ids = sorted({
+            location_id for alias, location_id in self._aliases[kind] if needle in alias
+        })
+        with self._lock:
+            resolved[needle] = ids
+            while len(resolved) > LOCATION_RESOLVE_CACHE_SIZE:
+                resolved.popitem(last=False)
+        return ids
+
+
+def _build_location_aliases():
+    city_aliases = {
+        (str(name).lower(), city_id)
+        for name, city_id in db.session.query(Building.city, Building.city_id).distinct()
+        if city_id is not None
+    }
+    state_aliases = {
+        (str(name).lower(), state_id)
+        for name, state_id in db.session.query(Building.state, Building.state_id).distinct()
+        if state_id is not None
+    }
+    missing = db.session.query(
+        Building.query.filter(db.or_(Building.city_id.is_(None), Building.state_id.is_(None))).exists()
+    ).scalar()
+    return LocationAliasMap(city_aliases, state_aliases, complete=not missing)
+
+
+location_aliases = CatalogVersionedIndex(_build_location_aliases, scope=BUILDINGS_SCOPE)
+
+
+def filter_by_location(query, column, id_column, kind, value):
+    # Equality on canonical ids; falls back to the substring scan until every building is backfilled.
+    aliases = location_aliases.get()
+    if not aliases.complete:
+        return query.filter(column.ilike(f"%{value}%"))
+    ids = aliases.resolve(kind, value)
+    return query.filter(id_column.in_(ids) if ids else db.false())
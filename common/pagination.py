@@ -0,0 +1,35 @@
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import tuple_
+
+
+KEYSET_CURSOR_SALT = "keyset-cursor"
+
+
+def _keyset_serializer():
+    return URLSafeSerializer(current_app.config["JWT_SECRET_KEY"], salt=KEYSET_CURSOR_SALT)
+
+
+def encode_keyset_cursor(sort, values):
+    return _keyset_serializer().dumps({"sort": sort, "after": list(values)})
+
+
+def decode_keyset_cursor(token, sort):
+    # Returns the sort key values of the last row already seen, or None if the token is unusable.
+    try:
+        data = _keyset_serializer().loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get("sort") != sort or not isinstance(data.get("after"), list):
+        return None
+    return data["after"]
+
+
+def keyset_after(columns, values, descending):
+    # Rows strictly after `values` in (columns...) order; a row-value comparison keeps it index friendly.
+    if len(columns) == 1:
+        return columns[0] < values[0] if descending else columns[0] > values[0]
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
@@ -1,7 +1,90 @@
 from functools import wraps
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import or_
+from extensions import db
 from .response import error_response
+from common.catalog_version import ROLES_SCOPE, CatalogVersionedIndex, bump_catalog_version
 from users.models_users import RegistrationUser
+from users.revoked_tokens_users import recently_deleted_user_ids
+
+
+INITIAL_ROLE_VERSION = 1
+# What a user who was never promoted and never had a role change holds; such users are not in the map.
+DEFAULT_ROLE_ENTRY = (INITIAL_ROLE_VERSION, "user")
+
+
+def role_for_user(user):
+    if user.is_master:
+        return "master"
+    if user.is_admin:
+        return "admin"
+    return "user"
+
+
+def role_claims(user):
+    # Signed into every access token so role_required can authorize without loading the user.
+    return {"role": role_for_user(user), "role_version": user.role_version or INITIAL_ROLE_VERSION}
+
+
+def bump_role_version(user):
+    # Runs inside the caller's transaction after a role change; tokens still carrying the old
+    # version fall back to the database check, on every worker within CATALOG_VERSION_CHECK_SECONDS.
+    user.role_version = (user.role_version or INITIAL_ROLE_VERSION) + 1
+    bump_catalog_version(ROLES_SCOPE)
+
+
+def _build_role_versions():
+    # (role_version, role) of every user that differs from DEFAULT_ROLE_ENTRY, plus None for users
+    # deleted within the token lifetime, so the map grows with role changes and deletions only.
+    rows = db.session.query(
+        RegistrationUser.id,
+        RegistrationUser.role_version,
+        RegistrationUser.is_admin,
+        RegistrationUser.is_master,
+    ).filter(
+        or_(
+            RegistrationUser.role_version > INITIAL_ROLE_VERSION,
+            RegistrationUser.is_admin,
+            RegistrationUser.is_master,
+        )
+    )
+    versions = {row.id: (row.role_version, role_for_user(row)) for row in rows}
+    # A deleted id reused by a new account stays marked, so its old tokens are checked in the database.
+    versions.update(dict.fromkeys(recently_deleted_user_ids()))
+    return versions
+
+
+# Privileged user creation, account deletion and role changes bump the roles version; the writing
+# worker patches its map through refresh_user_role/remove_user_role, other workers rebuild.
+role_versions = CatalogVersionedIndex(_build_role_versions, scope=ROLES_SCOPE, invalidate_on_write=False)
+
+
+def refresh_user_role(user):
+    # Called after the write that bumped the roles version commits.
+    user_id, entry = user.id, (user.role_version, role_for_user(user))
+    role_versions.apply(lambda versions: versions.__setitem__(user_id, entry))
+
+
+def remove_user_role(user_id):
+    # Called after the account deletion that bumped the roles version commits.
+    role_versions.apply(lambda versions: versions.__setitem__(user_id, None))
+
+
+def _current_role(identity, claims):
+    # Role from the token while its claims match the user's current role and version (DEFAULT_ROLE_ENTRY
+    # when the map has no entry); anything else (older tokens, deleted users, changed roles) is decided
+    # from the database.
+    try:
+        user_id = int(identity)
+    except (TypeError, ValueError):
+        return None
+
+    role, version = claims.get("role"), claims.get("role_version")
+    if role and version is not None and role_versions.get().get(user_id, DEFAULT_ROLE_ENTRY) == (version, role):
+        return role
+
+    user = db.session.get(RegistrationUser, user_id)
+    return role_for_user(user) if user else None
 
 
 def role_required(*allowed_roles):
@@ -11,18 +94,10 @@ def role_required(*allowed_roles):
         @wraps(fn)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-            user = RegistrationUser.query.get(user_id)
-            if not user:
+            role = _current_role(get_jwt_identity(), get_jwt())
+            if not role:
                 return error_response(status_code=401, message="Unauthorized", user_message="Invalid token.")
 
-            if user.is_master:
-                role = "master"
-            elif user.is_admin:
-                role = "admin"
-            else:
-                role = "user"
-
             if role not in allowed:
                 return error_response(
                     status_code=403,
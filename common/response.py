@@ -1,4 +1,4 @@
-from flask import jsonify
+from flask import Response, current_app, jsonify, stream_with_context
 
 
 def success_response(status_code=200, message="OK", data=None, add_size=False):
@@ -16,3 +16,14 @@ def error_response(status_code=400, message="Error", user_message="Something wen
         "error": error_message,
     }
     return jsonify(payload), status_code
+
+
+def streamed_success_response(status_code=200, items=()):
+    # Same envelope as success_response with `data` as a JSON array written one item at a time.
+    def generate():
+        yield '{"data":['
+        for index, item in enumerate(items):
+            yield ("," if index else "") + current_app.json.dumps(item, separators=(",", ":"))
+        yield f'],"status_code":{int(status_code)}}}\n'
+
+    return Response(stream_with_context(generate()), status=status_code, mimetype="application/json")
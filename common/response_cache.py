@@ -0,0 +1,184 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+import redis
+from flask import current_app, make_response, request
+from common.cache import declare_response_cache, response_cache_metadata
+from common.catalog_version import CATALOG_SCOPE, current_building_version, current_catalog_version
+
+
+SHARED_KEY_PREFIX = "kots:catalog:"
+# Stored values are the rendered body behind a one-byte flag recording whether it carries image URLs,
+# so a hit can restore the response metadata without decoding the body.
+IMAGES_FLAG = b"I"
+NO_IMAGES_FLAG = b"-"
+
+
+class LocalResponseCache:
+    # Per-worker LRU of rendered response values, bounded by entry count and total bytes.
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, max_entries, max_bytes):
+        if len(value) > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class RedisResponseCache:
+    # Shared backend; connection errors read as misses so the cache never fails a request.
+    def __init__(self, url):
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        try:
+            return self._client.get(key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key, value, ttl_seconds):
+        try:
+            self._client.set(key, value, ex=ttl_seconds)
+        except redis.RedisError:
+            pass
+
+
+local_response_cache = LocalResponseCache()
+_shared_backend = None
+_shared_backend_configured = False
+
+
+def set_shared_response_cache(backend):
+    # Swaps the shared tier (None disables it); otherwise it is built from RESPONSE_CACHE_REDIS_URL.
+    global _shared_backend, _shared_backend_configured
+    _shared_backend = backend
+    _shared_backend_configured = True
+
+
+def _shared_response_cache():
+    global _shared_backend, _shared_backend_configured
+    if not _shared_backend_configured:
+        url = current_app.config.get("RESPONSE_CACHE_REDIS_URL")
+        if url:
+            _shared_backend = RedisResponseCache(url)
+        _shared_backend_configured = True
+    return _shared_backend
+
+
+def _cache_get(key):
+    value = local_response_cache.get(key)
+    if value is not None:
+        return value
+    shared = _shared_response_cache()
+    if shared is None:
+        return None
+    value = shared.get(SHARED_KEY_PREFIX + key)
+    if value is not None:
+        _local_set(key, value)
+    return value
+
+
+def _local_set(key, value):
+    cfg = current_app.config
+    local_response_cache.set(
+        key,
+        value,
+        int(cfg.get("RESPONSE_CACHE_MAX_ENTRIES", 2048)),
+        int(cfg.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    )
+
+
+def _cache_set(key, value):
+    _local_set(key, value)
+    shared = _shared_response_cache()
+    if shared is not None:
+        ttl_seconds = int(current_app.config.get("RESPONSE_CACHE_SHARED_TTL_SECONDS", 3600))
+        shared.set(SHARED_KEY_PREFIX + key, value, ttl_seconds)
+
+
+def _response_cache_key(version, view_args):
+    parts = [
+        request.endpoint,
+        str(version),
+        repr(sorted(view_args.items())),
+        repr(sorted(request.args.items(multi=True))),
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Authorization")
+    return response
+
+
+def _tag_response(response, etag):
+    response.set_etag(etag)
+    # Clients revalidate every time; a match costs one version lookup. The image cache hook may
+    # still widen this to a max-age for image-bearing payloads.
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Authorization")
+    return response
+
+
+def cached_catalog_response(view):
+    # Serves a public catalog GET from the response cache. Keys combine the endpoint, its URL and
+    # query arguments and the inventory version of the building in the URL (the catalog-wide version
+    # for listings), so the first read after an admin write misses and renders fresh data. The key
+    # doubles as the ETag, so If-None-Match is answered with a 304 before the view runs.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        building_id = kwargs.get("building_id")
+        if building_id is None:
+            version = current_catalog_version(CATALOG_SCOPE)
+        else:
+            version = current_building_version(building_id)
+            if version is None:
+                return view(*args, **kwargs)
+
+        key = _response_cache_key(version, kwargs)
+        if request.if_none_match.contains_weak(key):
+            return _not_modified(key)
+
+        enabled = current_app.config.get("RESPONSE_CACHE_ENABLED", True)
+        value = _cache_get(key) if enabled else None
+        if value is not None:
+            if value[:1] == IMAGES_FLAG:
+                declare_response_cache(images=True)
+            response = current_app.response_class(value[1:], status=200, mimetype="application/json")
+            return _tag_response(response, key)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        if enabled:
+            flag = IMAGES_FLAG if response_cache_metadata().get("images") else NO_IMAGES_FLAG
+            _cache_set(key, flag + response.get_data())
+        return _tag_response(response, key)
+
+    return wrapper
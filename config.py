@@ -28,4 +28,23 @@ class Config:
     ADDRESS_SCORE_STRONG_PARTIAL = float(os.getenv("ADDRESS_SCORE_STRONG_PARTIAL", "80"))
     ADDRESS_SCORE_MEDIUM_PARTIAL = float(os.getenv("ADDRESS_SCORE_MEDIUM_PARTIAL", "55"))
     ADDRESS_SCORE_WEAK_PARTIAL = float(os.getenv("ADDRESS_SCORE_WEAK_PARTIAL", "30"))
+    ADDRESS_SCORE_FUZZY = float(os.getenv("ADDRESS_SCORE_FUZZY", "45"))
+    ADDRESS_FUZZY_MAX_DISTANCE = int(os.getenv("ADDRESS_FUZZY_MAX_DISTANCE", "2"))
     ADDRESS_SCORE_MIN_INCLUDE = float(os.getenv("ADDRESS_SCORE_MIN_INCLUDE", "1"))
+    ADDRESS_SEARCH_BACKEND = os.getenv("ADDRESS_SEARCH_BACKEND", "python").strip().lower()
+    SEARCH_SNAPSHOT_TTL_SECONDS = int(os.getenv("SEARCH_SNAPSHOT_TTL_SECONDS", "300"))
+    SEARCH_SNAPSHOT_MAX_ENTRIES = int(os.getenv("SEARCH_SNAPSHOT_MAX_ENTRIES", "256"))
+    SEARCH_SNAPSHOT_MAX_IDS = int(os.getenv("SEARCH_SNAPSHOT_MAX_IDS", "20000"))
+    CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "5"))
+    SEARCH_RENT_FACET_BUCKET = max(int(os.getenv("SEARCH_RENT_FACET_BUCKET", "5000")), 1)
+    SEARCH_RANK_POPULARITY_WEIGHT = float(os.getenv("SEARCH_RANK_POPULARITY_WEIGHT", "0"))
+    SEARCH_RANK_RECENCY_WEIGHT = float(os.getenv("SEARCH_RANK_RECENCY_WEIGHT", "0"))
+    SEARCH_POPULARITY_HALF_LIFE_DAYS = float(os.getenv("SEARCH_POPULARITY_HALF_LIFE_DAYS", "14"))
+    SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.getenv("SEARCH_RECENCY_HALF_LIFE_DAYS", "30"))
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+    RESPONSE_CACHE_SHARED_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_SHARED_TTL_SECONDS", "3600"))
+    REVOKED_TOKEN_SYNC_SECONDS = float(os.getenv("REVOKED_TOKEN_SYNC_SECONDS", "5"))
+    REVOKED_TOKEN_SYNC_OVERLAP_SECONDS = float(os.getenv("REVOKED_TOKEN_SYNC_OVERLAP_SECONDS", "30"))
@@ -1,5 +1,7 @@
 from extensions import db
 from users.models_users import RegistrationUser
+from common.catalog_version import ROLES_SCOPE, bump_catalog_version
+from common.permissions import bump_role_version, refresh_user_role, role_for_user
 from master.schemas_master import (
     validate_admin_create_payload,
     validate_pagination_params,
@@ -30,7 +32,26 @@ def create_admin_user(payload):
     )
     user.set_password(payload["password"])
     db.session.add(user)
+    bump_catalog_version(ROLES_SCOPE)
     db.session.commit()
+    refresh_user_role(user)
+    return user, None
+
+
+def change_user_role(email, role):
+    # Returns (user, error). Outstanding tokens carry the old role version, so they are re-checked
+    # against the database until the user logs in again.
+    user = RegistrationUser.query.filter_by(email=email).first()
+    if not user:
+        return None, "User not found."
+    if role_for_user(user) == role:
+        return user, None
+
+    user.is_master = role == "master"
+    user.is_admin = role in ("admin", "master")
+    bump_role_version(user)
+    db.session.commit()
+    refresh_user_role(user)
     return user, None
 
 
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import pytest
+
+# Config reads the environment at import time, so the throwaway database is chosen before the app
+# module is imported; nothing here ever touches the configured DATABASE_URL.
+_DB_DIR = tempfile.mkdtemp(prefix="kots-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from users.models_users import RegistrationUser  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def auth_headers(app):
+    user = RegistrationUser(email="user@example.com", is_admin=False, is_master=False)
+    user.set_password("user-password")
+    db.session.add(user)
+    db.session.commit()
+    response = app.test_client().post("/users/login", json={"email": user.email, "password": "user-password"})
+    return {"Authorization": "Bearer " + response.get_json()["data"]["token"]}
@@ -0,0 +1,52 @@
+import pytest
+from common.response_cache import SHARED_KEY_PREFIX, local_response_cache, set_shared_response_cache
+
+
+class InMemorySharedCache:
+    # Shared-tier stand-in with the RedisResponseCache interface; records the TTL each value was set with.
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.values.get(key)
+
+    def set(self, key, value, ttl_seconds):
+        self.values[key] = value
+        self.ttls[key] = ttl_seconds
+
+
+@pytest.fixture
+def shared_cache(app):
+    shared = InMemorySharedCache()
+    local_response_cache.clear()
+    set_shared_response_cache(shared)
+    yield shared
+    set_shared_response_cache(None)
+    local_response_cache.clear()
+
+
+def test_catalog_response_is_written_through_to_the_shared_tier(app, auth_headers, shared_cache):
+    client = app.test_client()
+    app.config["RESPONSE_CACHE_SHARED_TTL_SECONDS"] = 120
+
+    response = client.get("/users/buildings", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert list(shared_cache.values) == [SHARED_KEY_PREFIX + response.get_etag()[0]]
+    assert list(shared_cache.ttls.values()) == [120]
+
+
+def test_local_miss_is_served_from_the_shared_tier(app, auth_headers, shared_cache):
+    client = app.test_client()
+    first = client.get("/users/buildings", headers=auth_headers)
+    local_response_cache.clear()
+    gets = shared_cache.gets
+
+    second = client.get("/users/buildings", headers=auth_headers)
+
+    assert shared_cache.gets == gets + 1
+    assert second.get_data() == first.get_data()
+    assert second.get_etag() == first.get_etag()
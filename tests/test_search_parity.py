@@ -0,0 +1,98 @@
+import pytest
+from extensions import db
+from users.models_users import RegistrationUser
+from admins.models_admins import Building
+from users.search_users import (
+    AddressScorer,
+    select_top_buildings,
+    sql_address_scores,
+    sync_building_address_tokens,
+)
+
+
+PARITY_FIXTURE_ADDRESSES = [
+    "12 MG Road, Indiranagar",
+    "45 M.G. Road Extension",
+    "Outer Ring Road, Marathahalli",
+    "7th Cross, Koramangala 5th Block",
+    "Koramangala Industrial Layout",
+    "HSR Layout Sector 2",
+    "Sector 21, HSR",
+    "Whitefield Main Road",
+    "ITPL Main Road, Whitefield",
+    "Road No 12, Banjara Hills",
+    "Jayanagar 4th Block",
+    "Nagarbhavi 2nd Stage",
+    "Indira Nagar 100 Feet Road",
+    "Bannerghatta Road, BTM Layout",
+    "1st Main, 2nd Cross, RR Nagar",
+]
+
+PARITY_QUERIES = [
+    "mg road",
+    "road",
+    "ro",
+    "koramangala block",
+    "hsr layout sector 2",
+    "nagar",
+    "indiranagar",
+    "2nd",
+    "main road whitefield",
+    "outer ring",
+    "layout layout",
+    "zzz",
+    "koramangla",
+    "whitefeild main raod",
+]
+
+
+@pytest.fixture
+def building_ids(app):
+    owner = RegistrationUser(email="owner@example.com", is_admin=True, is_master=False)
+    owner.set_password("owner-password")
+    db.session.add(owner)
+    db.session.flush()
+
+    buildings = []
+    for index, address in enumerate(PARITY_FIXTURE_ADDRESSES):
+        building = Building(
+            admin_id=owner.id,
+            name=f"Parity Fixture {index}",
+            address=address,
+            city="Fixture City",
+            state="Fixture State",
+            pincode="000000",
+        )
+        sync_building_address_tokens(building)
+        db.session.add(building)
+        buildings.append(building)
+    db.session.commit()
+    return [building.id for building in buildings]
+
+
+def _python_ranking(search_address, building_ids):
+    rows = db.session.query(Building.id, Building.address).filter(Building.id.in_(building_ids))
+    ranked, _ = select_top_buildings(AddressScorer(search_address), rows, len(building_ids))
+    return ranked
+
+
+def _sql_ranking(search_address, building_ids):
+    address_scores = sql_address_scores(search_address)
+    if address_scores is None:
+        return []
+    return [
+        (float(score), building_id)
+        for building_id, score in db.session.query(address_scores.c.building_id, address_scores.c.score)
+        .filter(address_scores.c.building_id.in_(building_ids))
+        .order_by(address_scores.c.score.desc(), address_scores.c.building_id.desc())
+    ]
+
+
+@pytest.mark.parametrize("search_address", PARITY_QUERIES)
+def test_python_and_sql_address_rankings_match(building_ids, search_address):
+    python_ranked = _python_ranking(search_address, building_ids)
+    sql_ranked = _sql_ranking(search_address, building_ids)
+
+    assert [building_id for _, building_id in sql_ranked] == [building_id for _, building_id in python_ranked]
+    for (sql_score, _), (python_score, _) in zip(sql_ranked, python_ranked):
+        assert sql_score == pytest.approx(python_score)
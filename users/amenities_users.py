@@ -0,0 +1,211 @@
+import threading
+from collections import defaultdict
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from admins.models_admins import Amenity, AmenityBit, Flat, flat_amenities
+from common.catalog_version import AMENITIES_SCOPE, CatalogVersionedIndex, bump_catalog_version
+
+
+AMENITY_MATCH_MODES = ("all", "any")
+
+# Flat.amenity_mask is a signed 64-bit column; bit 63 would make masks negative.
+AMENITY_MASK_BITS = 63
+
+
+def normalize_amenity_name(name):
+    return " ".join(str(name or "").lower().split())
+
+
+class AmenityNameIndex:
+    # Mask bit and stored spellings per normalized amenity name. A wanted name with a known bit is
+    # matched by one bitwise AND on Flat.amenity_mask; a name whose bit this worker has not seen yet
+    # (or that got none once all bits were taken) falls back to an EXISTS on its spellings.
+    def __init__(self):
+        self._names = {}
+        self._spellings = {}
+        self._bits = {}
+        self._lock = threading.Lock()
+
+    def _discard(self, amenity_id):
+        name = self._names.pop(amenity_id, None)
+        if name is None:
+            return
+        key = normalize_amenity_name(name)
+        spellings = self._spellings.get(key, {})
+        spellings[name] -= 1
+        if not spellings[name]:
+            del spellings[name]
+        if not spellings:
+            self._spellings.pop(key, None)
+
+    def set_amenity(self, amenity_id, name):
+        with self._lock:
+            self._discard(amenity_id)
+            self._names[amenity_id] = name
+            spellings = self._spellings.setdefault(normalize_amenity_name(name), {})
+            spellings[name] = spellings.get(name, 0) + 1
+
+    def remove_amenity(self, amenity_id):
+        with self._lock:
+            self._discard(amenity_id)
+
+    def set_bit(self, name, bit):
+        with self._lock:
+            self._bits[name] = bit
+
+    def lookup(self, name):
+        key = normalize_amenity_name(name)
+        with self._lock:
+            return self._bits.get(key), sorted(self._spellings.get(key, ()))
+
+
+def _build_amenity_index():
+    index = AmenityNameIndex()
+    for amenity_id, name in db.session.query(Amenity.id, Amenity.name):
+        index.set_amenity(amenity_id, name)
+    for name, bit in db.session.query(AmenityBit.name, AmenityBit.bit):
+        index.set_bit(name, bit)
+    return index
+
+
+flat_amenity_names = CatalogVersionedIndex(
+    _build_amenity_index,
+    scope=AMENITIES_SCOPE,
+    invalidate_on_write=False,
+)
+
+
+def _has_amenity_named(spellings):
+    return exists().where(
+        flat_amenities.c.flat_id == Flat.id,
+        flat_amenities.c.amenity_id == Amenity.id,
+        Amenity.name.in_(spellings),
+    )
+
+
+def flat_amenities_condition(names, mode="all"):
+    # SQL condition on Flat; unknown names can never satisfy "all" and add nothing to "any".
+    index = flat_amenity_names.get()
+    mask = 0
+    unmasked = []
+    for name in names:
+        bit, spellings = index.lookup(name)
+        if not spellings:
+            if mode == "all":
+                return db.false()
+            continue
+        if bit is None:
+            unmasked.append(spellings)
+        else:
+            mask |= 1 << bit
+
+    if mode == "all":
+        conditions = [_has_amenity_named(spellings) for spellings in unmasked]
+        if mask:
+            conditions.insert(0, Flat.amenity_mask.op("&")(mask) == mask)
+        return and_(*conditions)
+
+    conditions = []
+    if mask:
+        conditions.append(Flat.amenity_mask.op("&")(mask) != 0)
+    if unmasked:
+        conditions.append(_has_amenity_named(sorted({spelling for spellings in unmasked for spelling in spellings})))
+    return or_(*conditions) if conditions else db.false()
+
+
+def _amenity_bit(name):
+    # Bits and names are both unique, so a concurrent writer claiming the same name or bit makes our insert
+    # fail; it runs in a savepoint so only it is rolled back, then the name is re-read or the next bit tried.
+    row = AmenityBit.query.filter_by(name=name).first()
+    if row is not None:
+        return row.bit
+    taken = {bit for (bit,) in db.session.query(AmenityBit.bit)}
+    for bit in range(AMENITY_MASK_BITS):
+        if bit in taken:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(AmenityBit(name=name, bit=bit))
+            return bit
+        except IntegrityError:
+            row = AmenityBit.query.filter_by(name=name).first()
+            if row is not None:
+                return row.bit
+    return None
+
+
+def _amenity_masks(rows):
+    # (flat_id, amenity name) rows -> {flat_id: mask}. Names that got no bit are left out of the mask;
+    # the filter checks those with EXISTS instead.
+    masks = defaultdict(int)
+    bits = {}
+    for flat_id, name in rows:
+        key = normalize_amenity_name(name)
+        if key not in bits:
+            bits[key] = _amenity_bit(key)
+        masks[flat_id] |= 0 if bits[key] is None else 1 << bits[key]
+    return masks
+
+
+def _flat_amenity_rows():
+    return db.session.query(flat_amenities.c.flat_id, Amenity.name).join(
+        Amenity,
+        Amenity.id == flat_amenities.c.amenity_id,
+    )
+
+
+def sync_flat_amenity_masks(flat_ids):
+    # Runs inside the caller's transaction, after its amenity writes are flushed.
+    flat_ids = list(flat_ids)
+    if not flat_ids:
+        return
+    masks = _amenity_masks(_flat_amenity_rows().filter(flat_amenities.c.flat_id.in_(flat_ids)).all())
+    for flat_id in flat_ids:
+        Flat.query.filter_by(id=flat_id).update({Flat.amenity_mask: masks[flat_id]}, synchronize_session=False)
+
+
+def repair_amenity_masks():
+    # Recomputes every flat's mask from flat_amenities and fixes the ones that drifted; returns how many.
+    expected = _amenity_masks(_flat_amenity_rows().all())
+    fixed = 0
+    for flat_id, mask in db.session.query(Flat.id, Flat.amenity_mask).all():
+        if mask != expected[flat_id]:
+            Flat.query.filter_by(id=flat_id).update({Flat.amenity_mask: expected[flat_id]}, synchronize_session=False)
+            fixed += 1
+    bump_catalog_version()
+    bump_catalog_version(AMENITIES_SCOPE)
+    db.session.commit()
+    return fixed
+
+
+def _refresh_bits(index, names):
+    keys = {normalize_amenity_name(name) for name in names}
+    for name, bit in db.session.query(AmenityBit.name, AmenityBit.bit).filter(AmenityBit.name.in_(keys)):
+        index.set_bit(name, bit)
+
+
+def refresh_flat_amenity_names(flat):
+    # Called after an admin write commits, so this worker serves the change without a rebuild.
+    amenities = [(amenity.id, amenity.name) for amenity in flat.amenities]
+
+    def update(index):
+        for amenity_id, name in amenities:
+            index.set_amenity(amenity_id, name)
+        _refresh_bits(index, [name for _, name in amenities])
+
+    flat_amenity_names.apply(update)
+
+
+def refresh_amenity_name(amenity):
+    amenity_id, name = amenity.id, amenity.name
+
+    def update(index):
+        index.set_amenity(amenity_id, name)
+        _refresh_bits(index, [name])
+
+    flat_amenity_names.apply(update)
+
+
+def remove_amenity_name(amenity_id):
+    flat_amenity_names.apply(lambda index: index.remove_amenity(amenity_id))
@@ -0,0 +1,86 @@
+from collections import Counter
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import Integer, cast, func
+from extensions import db
+from admins.models_admins import Building, Flat
+from users.search_users import AddressScorer, filter_address_candidates
+
+
+FLAT_SEARCH_FACETS = ("city", "state", "bhk_type", "is_available", "rent")
+
+
+def rent_bucket_width():
+    # Clamped to 1 so a zero or negative setting cannot divide by zero or flip the bucket order.
+    cfg = current_app.config if has_app_context() else {}
+    return Decimal(max(int(cfg.get("SEARCH_RENT_FACET_BUCKET", 5000)), 1))
+
+
+def _rent_bucket_column(width):
+    # Rents are non-negative, so truncation matches floor(); PostgreSQL rounds numeric casts instead.
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.floor(Flat.rent_amount / width)
+    return cast(Flat.rent_amount / width, Integer)
+
+
+def _facet_columns(facets, width):
+    columns = {
+        "city": Building.city,
+        "state": Building.state,
+        "bhk_type": Flat.bhk_type,
+        "is_available": Flat.is_available,
+        "rent": _rent_bucket_column(width),
+    }
+    return [columns[facet].label(f"facet_{facet}") for facet in facets]
+
+
+def _value_counts(counter):
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+    ]
+
+
+def flat_search_facets(query, facets, search_address=None):
+    # One grouped query over the filtered (Flat, Tower, Building) query. Each group row carries the
+    # requested facet values and a flat count, and the per-facet counts are rolled up from it.
+    # Address searches also group by building so every building is scored once, as in ranking.
+    width = rent_bucket_width()
+    columns = _facet_columns(facets, width)
+    scorer = None
+    if search_address:
+        scorer = AddressScorer(search_address)
+        query = filter_address_candidates(query, search_address)
+        columns += [Building.id, Building.address]
+
+    rows = query.with_entities(*columns, func.count(Flat.id)).group_by(*columns).order_by(None)
+
+    counters = {facet: Counter() for facet in facets}
+    building_scores = {}
+    for row in rows:
+        if scorer is not None:
+            building_id, address = row[-3], row[-2]
+            if building_id not in building_scores:
+                building_scores[building_id] = scorer.includes(scorer.score(address, building_id))
+            if not building_scores[building_id]:
+                continue
+        count = row[-1]
+        for index, facet in enumerate(facets):
+            counters[facet][row[index]] += count
+
+    result = {}
+    for facet in facets:
+        if facet == "rent":
+            result[facet] = [
+                {
+                    "min": float(int(bucket) * width),
+                    "max": float((int(bucket) + 1) * width),
+                    "count": counters[facet][bucket],
+                }
+                for bucket in sorted(counters[facet], key=int)
+            ]
+        elif facet == "is_available":
+            result[facet] = _value_counts(Counter({bool(k): v for k, v in counters[facet].items()}))
+        else:
+            result[facet] = _value_counts(counters[facet])
+    return result
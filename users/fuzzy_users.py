@@ -0,0 +1,92 @@
+from collections import defaultdict
+from flask import current_app, has_app_context
+from extensions import db
+from admins.models_admins import BuildingAddressToken
+from common.catalog_version import BUILDINGS_SCOPE, CatalogVersionedIndex
+
+
+# One edit is allowed per this many query characters (capped by ADDRESS_FUZZY_MAX_DISTANCE),
+# so short words such as "mg" or "road" never fan out into unrelated tokens.
+FUZZY_CHARS_PER_EDIT = 4
+
+
+def _deletes(word, max_distance):
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {item[:index] + item[index + 1:] for item in frontier for index in range(len(item))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(left, right, max_distance):
+    # Optimal string alignment distance, abandoned once every cell of a row exceeds `max_distance`.
+    if abs(len(left) - len(right)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(right) + 1))
+    for i in range(1, len(left) + 1):
+        current = [i] + [0] * len(right)
+        for j in range(1, len(right) + 1):
+            cost = 0 if left[i - 1] == right[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous_previous is not None
+                and i > 1
+                and j > 1
+                and left[i - 1] == right[j - 2]
+                and left[i - 2] == right[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class AddressVocabulary:
+    # SymSpell-style deletion dictionary over the distinct address tokens: every term is stored
+    # under each of its deletes, so a lookup only generates the query word's deletes and verifies
+    # the few terms sharing one of them instead of comparing against the whole vocabulary.
+    def __init__(self, terms, max_distance):
+        self.max_distance = max_distance
+        self.terms = frozenset(terms)
+        self._deletes = defaultdict(set)
+        for term in self.terms:
+            for variant in _deletes(term, max_distance):
+                self._deletes[variant].add(term)
+
+    def lookup(self, word, max_distance):
+        max_distance = min(max_distance, self.max_distance)
+        if max_distance <= 0:
+            return frozenset()
+        candidates = set()
+        for variant in _deletes(word, max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+        return frozenset(
+            term
+            for term in candidates
+            if term != word and edit_distance(word, term, max_distance) <= max_distance
+        )
+
+
+def _fuzzy_max_distance():
+    return int(current_app.config.get("ADDRESS_FUZZY_MAX_DISTANCE", 2))
+
+
+def _build_address_vocabulary():
+    terms = [token for (token,) in db.session.query(BuildingAddressToken.token).distinct()]
+    return AddressVocabulary(terms, _fuzzy_max_distance())
+
+
+# Only building writes and token index rebuilds change the vocabulary, so flat and amenity writes do not
+# rebuild it.
+address_vocabulary = CatalogVersionedIndex(_build_address_vocabulary, scope=BUILDINGS_SCOPE)
+
+
+def fuzzy_address_terms(word, tuning):
+    # Indexed address tokens within the allowed edit distance of `word` (never `word` itself).
+    max_distance = min(int(tuning["fuzzy_max_distance"]), len(word) // FUZZY_CHARS_PER_EDIT)
+    if max_distance <= 0 or tuning["score_fuzzy"] <= 0 or not has_app_context():
+        return frozenset()
+    return address_vocabulary.get().lookup(word, max_distance)
@@ -0,0 +1,99 @@
+import math
+from sqlalchemy import or_
+from extensions import db
+from admins.models_admins import Building
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320
+MAX_RADIUS_KM = 100
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value_range, value = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits <<= 1
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def _cell_size_degrees(precision):
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_cells_for_radius(latitude, longitude, radius_km):
+    # Picks the finest precision whose cells are at least `radius_km` tall and wide, so the 3x3 block
+    # of cells around the point covers the whole circle. Widths use the circle's poleward edge, where
+    # a degree of longitude is shortest.
+    edge_lat = min(abs(latitude) + radius_km / KM_PER_DEGREE_LAT, 90.0)
+    cos_lat = max(math.cos(math.radians(edge_lat)), 1e-6)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lon_size = _cell_size_degrees(candidate)
+        if lat_size * KM_PER_DEGREE_LAT >= radius_km and lon_size * KM_PER_DEGREE_LON * cos_lat >= radius_km:
+            precision = candidate
+            break
+
+    lat_size, lon_size = _cell_size_degrees(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        cell_lat = min(90.0, max(-90.0, latitude + lat_step * lat_size))
+        for lon_step in (-1, 0, 1):
+            cell_lon = (longitude + lon_step * lon_size + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(cell_lat, cell_lon, precision))
+    return cells
+
+
+def _geohash_prefix_condition(prefix):
+    # Stored hashes are all GEOHASH_PRECISION characters from the alphabet, so a prefix is a closed
+    # range between its lowest and highest padding; SQLite and PostgreSQL both serve it from a btree.
+    padding = GEOHASH_PRECISION - len(prefix)
+    return Building.geohash.between(
+        prefix + GEOHASH_ALPHABET[0] * padding,
+        prefix + GEOHASH_ALPHABET[-1] * padding,
+    )
+
+
+def buildings_within_radius(latitude, longitude, radius_km):
+    # Returns {building_id: distance_km}. Geohash cells prune candidates in SQL; exact distances
+    # are only computed for the buildings left.
+    cells = geohash_cells_for_radius(latitude, longitude, radius_km)
+    rows = db.session.query(Building.id, Building.latitude, Building.longitude).filter(
+        or_(*[_geohash_prefix_condition(cell) for cell in cells])
+    )
+    distances = {}
+    for building_id, building_lat, building_lon in rows:
+        distance = haversine_km(latitude, longitude, building_lat, building_lon)
+        if distance <= radius_km:
+            distances[building_id] = distance
+    return distances
@@ -11,6 +11,8 @@ class RegistrationUser(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     is_master = db.Column(db.Boolean, default=False, nullable=False)
+    # Signed into access tokens with the role; bumped whenever the role changes.
+    role_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     profile = db.relationship(
@@ -19,6 +21,11 @@ class RegistrationUser(db.Model):
         uselist=False,
         cascade="all, delete-orphan",
     )
+    saved_searches = db.relationship(
+        "SavedSearch",
+        back_populates="user",
+        cascade="all, delete-orphan",
+    )
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -66,4 +73,42 @@ class RevokedToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(255), unique=True, nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey("registration_users.id"), nullable=True)
-    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class SavedSearch(db.Model):
+    __tablename__ = "saved_searches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("registration_users.id"), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=True)
+    # Normalized flat search filters (see users.search_cache_users.normalize_search_filters).
+    filters = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship("RegistrationUser", back_populates="saved_searches")
+    matches = db.relationship(
+        "SavedSearchMatch",
+        back_populates="saved_search",
+        cascade="all, delete-orphan",
+    )
+
+
+class SavedSearchMatch(db.Model):
+    __tablename__ = "saved_search_matches"
+    __table_args__ = (
+        db.UniqueConstraint("saved_search_id", "flat_id", name="uq_saved_search_flat"),
+        # The "new matches" feed pages a saved search's matches newest first on (saved_search_id, id).
+        db.Index("ix_saved_search_matches_search_id_id", "saved_search_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey("saved_searches.id"), nullable=False)
+    flat_id = db.Column(db.Integer, db.ForeignKey("flats.id"), nullable=False, index=True)
+    matched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    saved_search = db.relationship("SavedSearch", back_populates="matches")
+    flat = db.relationship(
+        "Flat",
+        backref=db.backref("saved_search_matches", cascade="all, delete-orphan"),
+    )
@@ -0,0 +1,144 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from admins.models_admins import BookingCounter
+from common.catalog_version import BOOKINGS_SCOPE, CatalogVersionedIndex, bump_catalog_version
+
+
+POPULARITY_WINDOW_DAYS = 120
+# Share of a building's activity credited to each of its flats.
+BUILDING_POPULARITY_SHARE = 0.2
+# Decayed activity at which a flat gets half of the popularity weight.
+POPULARITY_PIVOT = 2.0
+REBASE_AFTER_DAYS = 180
+
+
+def rank_tuning():
+    cfg = current_app.config
+    return {
+        "popularity_weight": max(float(cfg.get("SEARCH_RANK_POPULARITY_WEIGHT", 0)), 0.0),
+        "recency_weight": max(float(cfg.get("SEARCH_RANK_RECENCY_WEIGHT", 0)), 0.0),
+        "popularity_half_life": float(cfg.get("SEARCH_POPULARITY_HALF_LIFE_DAYS", 14)),
+        "recency_half_life": float(cfg.get("SEARCH_RECENCY_HALF_LIFE_DAYS", 30)),
+    }
+
+
+def max_rank_boost(tuning):
+    # Popularity and recency are each scaled into [0, weight], so no flat gains more than this.
+    return tuning["popularity_weight"] + tuning["recency_weight"]
+
+
+def blended_ranking_enabled(tuning=None):
+    return max_rank_boost(tuning or rank_tuning()) > 0
+
+
+class BookingPopularity:
+    # Exponentially decayed booking activity per flat and building. Scores are kept relative to a
+    # fixed epoch day (activity * 2 ** (days since epoch / half life)), so an increment touches one
+    # number and the decayed value for today is a single division.
+    def __init__(self, half_life_days, today):
+        self._half_life = max(half_life_days, 0.1)
+        self._epoch = today
+        self._scores = {"flat": {}, "building": {}}
+        self._lock = threading.Lock()
+
+    def _growth(self, day):
+        return 2 ** ((day - self._epoch).days / self._half_life)
+
+    def _rebase(self, day):
+        factor = 1 / self._growth(day)
+        for scores in self._scores.values():
+            for entity_id in scores:
+                scores[entity_id] *= factor
+        self._epoch = day
+
+    def add(self, kind, entity_id, day, amount):
+        with self._lock:
+            if (day - self._epoch).days > REBASE_AFTER_DAYS:
+                self._rebase(day)
+            scores = self._scores[kind]
+            scores[entity_id] = scores.get(entity_id, 0.0) + amount * self._growth(day)
+
+    def score(self, flat_id, building_id, today):
+        # Saturating [0, 1) popularity of a flat today.
+        with self._lock:
+            raw = self._scores["flat"].get(flat_id, 0.0)
+            raw += BUILDING_POPULARITY_SHARE * self._scores["building"].get(building_id, 0.0)
+            raw = max(raw / self._growth(today), 0.0)
+        return raw / (raw + POPULARITY_PIVOT)
+
+
+def _build_booking_popularity():
+    today = datetime.utcnow().date()
+    popularity = BookingPopularity(rank_tuning()["popularity_half_life"], today)
+    counters = db.session.query(
+        BookingCounter.kind,
+        BookingCounter.entity_id,
+        BookingCounter.bucket,
+        BookingCounter.bookings + BookingCounter.approvals,
+    ).filter(BookingCounter.bucket >= today - timedelta(days=POPULARITY_WINDOW_DAYS))
+    for kind, entity_id, bucket, activity in counters:
+        popularity.add(kind, entity_id, bucket, activity)
+    return popularity
+
+
+booking_popularity = CatalogVersionedIndex(
+    _build_booking_popularity,
+    scope=BOOKINGS_SCOPE,
+    invalidate_on_write=False,
+)
+
+
+def _booking_entities(booking):
+    entities = [("flat", booking.flat_id), ("building", booking.building_id)]
+    return [(kind, entity_id) for kind, entity_id in entities if entity_id is not None]
+
+
+def count_booking_activity(booking, bookings=0, approvals=0):
+    # Runs inside the caller's transaction: adds to today's flat and building counters.
+    bucket = datetime.utcnow().date()
+    for kind, entity_id in _booking_entities(booking):
+        updated = BookingCounter.query.filter_by(kind=kind, entity_id=entity_id, bucket=bucket).update(
+            {
+                BookingCounter.bookings: BookingCounter.bookings + bookings,
+                BookingCounter.approvals: BookingCounter.approvals + approvals,
+            },
+            synchronize_session=False,
+        )
+        if not updated:
+            db.session.add(
+                BookingCounter(kind=kind, entity_id=entity_id, bucket=bucket, bookings=bookings, approvals=approvals)
+            )
+    bump_catalog_version(BOOKINGS_SCOPE)
+
+
+def refresh_booking_popularity(booking, bookings=0, approvals=0):
+    # Called after the booking write commits, so this worker ranks with it without a rebuild.
+    bucket = datetime.utcnow().date()
+    entities = _booking_entities(booking)
+
+    def update(popularity):
+        for kind, entity_id in entities:
+            popularity.add(kind, entity_id, bucket, bookings + approvals)
+
+    booking_popularity.apply(update)
+
+
+def rank_flats_blended(rows, building_scores, tuning):
+    # rows: (flat_id, building_id, created_at). Returns flat ids by blended score, then newest flat.
+    now = datetime.utcnow()
+    today = now.date()
+    popularity = booking_popularity.get() if tuning["popularity_weight"] else None
+    recency_half_life = max(tuning["recency_half_life"], 0.1)
+    scored = []
+    for flat_id, building_id, created_at in rows:
+        score = building_scores[building_id]
+        if popularity is not None:
+            score += tuning["popularity_weight"] * popularity.score(flat_id, building_id, today)
+        if tuning["recency_weight"] and created_at is not None:
+            age_days = max((now - created_at).total_seconds() / 86400, 0.0)
+            score += tuning["recency_weight"] * 2 ** (-age_days / recency_half_life)
+        scored.append((score, flat_id))
+    scored.sort(reverse=True)
+    return [flat_id for _, flat_id in scored]
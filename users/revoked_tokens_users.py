@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from flask import current_app
+from extensions import db
+from users.models_users import RevokedToken
+
+# Account deletions are kept as revoked_tokens rows under this jti prefix, so they expire and are pruned
+# together with the tokens the deleted user could still hold. The row never matches a real token's jti.
+DELETED_USER_JTI_PREFIX = "deleted-user:"
+
+
+def _expired_before():
+    # Revocations older than the token lifetime only cover tokens that have already expired; None when
+    # access tokens never expire.
+    lifetime = current_app.config.get("JWT_ACCESS_TOKEN_EXPIRES")
+    if not isinstance(lifetime, timedelta):
+        return None
+    return datetime.utcnow() - lifetime
+
+
+class RevokedTokenCache:
+    # Per-worker copy of the revoked jtis that can still belong to a live token, so the blocklist check
+    # is a set lookup. Rows revoked since the last sync are pulled by `revoked_at` at most every
+    # REVOKED_TOKEN_SYNC_SECONDS, so a logout on another worker is honoured within that delay. Each sync
+    # re-reads an overlap window to catch rows whose transaction committed after a later one.
+    def __init__(self):
+        self._revoked = {}
+        self._synced_to = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        interval = float(current_app.config.get("REVOKED_TOKEN_SYNC_SECONDS", 5))
+        now = time.monotonic()
+        with self._lock:
+            if self._synced_to is None or now - self._checked_at >= interval:
+                self._sync()
+                self._checked_at = now
+            return jti in self._revoked
+
+    def add(self, jti, revoked_at):
+        # Called after this worker commits a revocation, so it is enforced here without waiting for a sync.
+        with self._lock:
+            self._revoked[jti] = revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._synced_to = None
+            self._checked_at = 0.0
+
+    def _sync(self):
+        started = datetime.utcnow()
+        expired_before = _expired_before()
+        since = expired_before
+        if self._synced_to is not None:
+            overlap = timedelta(seconds=float(current_app.config.get("REVOKED_TOKEN_SYNC_OVERLAP_SECONDS", 30)))
+            since = self._synced_to - overlap
+            if expired_before is not None:
+                since = max(since, expired_before)
+
+        query = db.session.query(RevokedToken.jti, RevokedToken.revoked_at)
+        if since is not None:
+            query = query.filter(RevokedToken.revoked_at >= since)
+        for jti, revoked_at in query:
+            self._revoked[jti] = revoked_at
+
+        if expired_before is not None:
+            for jti in [jti for jti, revoked_at in self._revoked.items() if revoked_at < expired_before]:
+                del self._revoked[jti]
+        self._synced_to = started
+
+
+revoked_token_cache = RevokedTokenCache()
+
+
+def record_user_deletion(user_id):
+    # Runs inside the caller's transaction.
+    db.session.add(RevokedToken(jti=f"{DELETED_USER_JTI_PREFIX}{user_id}:{uuid4().hex}"))
+
+
+def recently_deleted_user_ids():
+    # Ids of users deleted within the access token lifetime.
+    query = db.session.query(RevokedToken.jti).filter(RevokedToken.jti.startswith(DELETED_USER_JTI_PREFIX))
+    expired_before = _expired_before()
+    if expired_before is not None:
+        query = query.filter(RevokedToken.revoked_at >= expired_before)
+    return {int(jti[len(DELETED_USER_JTI_PREFIX):].split(":", 1)[0]) for (jti,) in query}
+
+
+def prune_revoked_tokens():
+    # Deletes revocations whose tokens have expired; returns the number of rows removed.
+    expired_before = _expired_before()
+    if expired_before is None:
+        return 0
+    deleted = RevokedToken.query.filter(RevokedToken.revoked_at < expired_before).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -1,6 +1,7 @@
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from common.response import success_response, error_response
+from common.response import success_response, error_response, streamed_success_response
+from common.response_cache import cached_catalog_response
 from users.services_users import (
     users_health_service,
     register_user_service,
@@ -21,6 +22,12 @@ from users.services_users import (
     list_tower_flats_service,
     search_flats_service,
     search_buildings_service,
+    suggest_service,
+    similar_flats_service,
+    create_saved_search_service,
+    list_saved_searches_service,
+    delete_saved_search_service,
+    list_saved_search_matches_service,
     get_flat_detail_service,
     list_building_towers_service,
     create_security_deposit_booking_service,
@@ -131,17 +138,21 @@ def logout():
 
 @users_bp.route("/buildings", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def list_buildings():
-    result, err = list_buildings_service()
+    result, err = list_buildings_service(request.args)
     if err:
         return error_response(**err, add_size=True)
+    if "stream" in result:
+        return streamed_success_response(status_code=result["status_code"], items=result["stream"])
     return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
 
 
 @users_bp.route("/buildings/<int:building_id>", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def get_building_detail(building_id):
-    result, err = get_building_detail_service(building_id)
+    result, err = get_building_detail_service(building_id, request.args)
     if err:
         return error_response(**err, add_size=True)
     return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
@@ -149,6 +160,7 @@ def get_building_detail(building_id):
 
 @users_bp.route("/buildings/<int:building_id>/amenities", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def get_building_amenities(building_id):
     result, err = get_building_amenities_service(building_id)
     if err:
@@ -158,6 +170,7 @@ def get_building_amenities(building_id):
 
 @users_bp.route("/buildings/<int:building_id>/amenities/<int:amenity_id>", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def get_building_amenity(building_id, amenity_id):
     result, err = get_building_amenity_service(building_id, amenity_id)
     if err:
@@ -167,6 +180,7 @@ def get_building_amenity(building_id, amenity_id):
 
 @users_bp.route("/buildings/<int:building_id>/towers/<int:tower_id>", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def get_tower_detail(building_id, tower_id):
     result, err = get_tower_detail_service(building_id, tower_id)
     if err:
@@ -176,12 +190,15 @@ def get_tower_detail(building_id, tower_id):
 
 @users_bp.route("/buildings/<int:building_id>/towers/<int:tower_id>/flats", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def list_tower_flats(building_id, tower_id):
     result, err = list_tower_flats_service(
         building_id,
         tower_id,
         request.args.get("status"),
         request.args.get("page"),
+        request.args.get("after"),
+        request.args,
     )
     if err:
         return error_response(**err, add_size=True)
@@ -206,10 +223,65 @@ def search_buildings():
     return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
 
 
+@users_bp.route("/suggest", methods=["GET"])
+@jwt_required()
+def suggest():
+    result, err = suggest_service(request.args)
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
+@users_bp.route("/flats/<int:flat_id>/similar", methods=["GET"])
+@jwt_required()
+def similar_flats(flat_id):
+    result, err = similar_flats_service(flat_id, request.args)
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
+@users_bp.route("/saved-searches", methods=["POST"])
+@jwt_required()
+def create_saved_search():
+    result, err = create_saved_search_service(get_jwt_identity(), request.get_json(silent=True))
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
+@users_bp.route("/saved-searches", methods=["GET"])
+@jwt_required()
+def list_saved_searches():
+    result, err = list_saved_searches_service(get_jwt_identity())
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
+@users_bp.route("/saved-searches/<int:saved_search_id>", methods=["DELETE"])
+@jwt_required()
+def delete_saved_search(saved_search_id):
+    result, err = delete_saved_search_service(get_jwt_identity(), saved_search_id)
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
+@users_bp.route("/saved-searches/<int:saved_search_id>/matches", methods=["GET"])
+@jwt_required()
+def list_saved_search_matches(saved_search_id):
+    result, err = list_saved_search_matches_service(get_jwt_identity(), saved_search_id, request.args)
+    if err:
+        return error_response(**err, add_size=True)
+    return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
+
+
 @users_bp.route("/buildings/<int:building_id>/towers/<int:tower_id>/flats/<int:flat_id>", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def get_flat_detail(building_id, tower_id, flat_id):
-    result, err = get_flat_detail_service(building_id, tower_id, flat_id)
+    result, err = get_flat_detail_service(building_id, tower_id, flat_id, request.args)
     if err:
         return error_response(**err, add_size=True)
     return success_response(status_code=result["status_code"], message=result["message"], data=result["data"], add_size=True)
@@ -217,6 +289,7 @@ def get_flat_detail(building_id, tower_id, flat_id):
 
 @users_bp.route("/buildings/<int:building_id>/towers", methods=["GET"])
 @jwt_required()
+@cached_catalog_response
 def list_building_towers(building_id):
     result, err = list_building_towers_service(building_id)
     if err:
@@ -0,0 +1,212 @@
+import threading
+from decimal import Decimal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from extensions import db
+from admins.models_admins import Building, Flat, Tower
+from common.catalog_version import SAVED_SEARCHES_SCOPE, CatalogVersionedIndex
+from users.models_users import SavedSearch, SavedSearchMatch
+from users.search_users import AddressScorer
+from users.geo_users import haversine_km
+from users.amenities_users import normalize_amenity_name
+
+
+SAVED_SEARCH_MAX_PER_USER = 20
+SAVED_SEARCH_RENT_BAND = 10000
+# Rent ranges spanning more bands than this (or open-ended ones) go to the any-rent band instead.
+SAVED_SEARCH_MAX_BANDS = 20
+
+
+def _rent_band(rent):
+    return int(Decimal(rent) // SAVED_SEARCH_RENT_BAND)
+
+
+def _rent_bands(filters):
+    if filters["min_rent"] is None or filters["max_rent"] is None:
+        return [None]
+    low, high = _rent_band(filters["min_rent"]), _rent_band(filters["max_rent"])
+    if high < low or high - low >= SAVED_SEARCH_MAX_BANDS:
+        return [None]
+    return list(range(low, high + 1))
+
+
+def saved_search_matches(filters, flat, building, amenity_names):
+    # Same semantics as the flat search filters, evaluated against one flat in memory.
+    if filters["available_only"] and not flat.is_available:
+        return False
+    if filters["city"] and filters["city"] not in (building.city or "").lower():
+        return False
+    if filters["state"] and filters["state"] not in (building.state or "").lower():
+        return False
+    if filters["flat_type"] and filters["flat_type"] not in (flat.bhk_type or "").lower():
+        return False
+
+    rent = Decimal(str(flat.rent_amount))
+    if filters["min_rent"] is not None and rent < Decimal(filters["min_rent"]):
+        return False
+    if filters["max_rent"] is not None and rent > Decimal(filters["max_rent"]):
+        return False
+
+    if filters["near"]:
+        if building.latitude is None or building.longitude is None:
+            return False
+        distance = haversine_km(filters["near"][0], filters["near"][1], building.latitude, building.longitude)
+        if distance > filters["radius_km"]:
+            return False
+
+    if filters["amenities"]:
+        names = {normalize_amenity_name(name) for name in amenity_names}
+        wanted = set(filters["amenities"])
+        if filters["amenities_match"] == "any":
+            if not names & wanted:
+                return False
+        elif not wanted <= names:
+            return False
+
+    if filters["address"]:
+        scorer = AddressScorer(filters["address"])
+        if not scorer.includes(scorer.score(building.address, building.id)):
+            return False
+    return True
+
+
+class SavedSearchIndex:
+    # Percolator: saved searches are bucketed by (city, BHK, rent band) so a flat write only checks
+    # the searches whose buckets it falls into. City and BHK filters are substring matches, so their
+    # distinct needles are kept aside and tested against the flat's values to find its buckets.
+    def __init__(self):
+        self._buckets = {}
+        self._keys = {}
+        self._city_needles = {}
+        self._bhk_needles = {}
+        self._lock = threading.Lock()
+
+    def add(self, search_id, filters):
+        with self._lock:
+            self._remove(search_id)
+            city, bhk_type = filters["city"], filters["flat_type"]
+            keys = [(city, bhk_type, band) for band in _rent_bands(filters)]
+            for key in keys:
+                self._buckets.setdefault(key, {})[search_id] = filters
+            self._keys[search_id] = keys
+            if city:
+                self._city_needles[city] = self._city_needles.get(city, 0) + 1
+            if bhk_type:
+                self._bhk_needles[bhk_type] = self._bhk_needles.get(bhk_type, 0) + 1
+
+    def remove(self, search_id):
+        with self._lock:
+            self._remove(search_id)
+
+    def _remove(self, search_id):
+        keys = self._keys.pop(search_id, None)
+        if not keys:
+            return
+        for key in keys:
+            bucket = self._buckets.get(key, {})
+            bucket.pop(search_id, None)
+            if not bucket:
+                self._buckets.pop(key, None)
+        city, bhk_type, _ = keys[0]
+        for needles, needle in ((self._city_needles, city), (self._bhk_needles, bhk_type)):
+            if needle:
+                needles[needle] -= 1
+                if not needles[needle]:
+                    del needles[needle]
+
+    def candidates(self, city, bhk_type, rent):
+        # Returns {search_id: filters} for every saved search whose buckets cover this flat.
+        city = (city or "").lower()
+        bhk_type = (bhk_type or "").lower()
+        with self._lock:
+            cities = [None] + [needle for needle in self._city_needles if needle in city]
+            bhk_types = [None] + [needle for needle in self._bhk_needles if needle in bhk_type]
+            bands = (None, _rent_band(rent))
+            found = {}
+            for city_key in cities:
+                for bhk_key in bhk_types:
+                    for band in bands:
+                        found.update(self._buckets.get((city_key, bhk_key, band), {}))
+            return found
+
+
+def _build_saved_search_index():
+    index = SavedSearchIndex()
+    for search_id, filters in db.session.query(SavedSearch.id, SavedSearch.filters):
+        index.add(search_id, filters)
+    return index
+
+
+saved_search_index = CatalogVersionedIndex(
+    _build_saved_search_index,
+    scope=SAVED_SEARCHES_SCOPE,
+    invalidate_on_write=False,
+)
+
+
+def _record_matches(flat, building):
+    # Adds a match for every saved search the flat now satisfies. Matches are only ever added, so a
+    # flat shows up once per saved search.
+    candidates = saved_search_index.get().candidates(building.city, flat.bhk_type, flat.rent_amount)
+    if not candidates:
+        return 0
+
+    amenity_names = [amenity.name for amenity in flat.amenities]
+    matched = {
+        search_id
+        for search_id, filters in candidates.items()
+        if saved_search_matches(filters, flat, building, amenity_names)
+    }
+    if not matched:
+        return 0
+
+    # The index can trail deletes made on other workers by up to CATALOG_VERSION_CHECK_SECONDS.
+    live = {
+        search_id
+        for (search_id,) in db.session.query(SavedSearch.id).filter(SavedSearch.id.in_(list(matched)))
+    }
+    existing = {
+        search_id
+        for (search_id,) in db.session.query(SavedSearchMatch.saved_search_id).filter(
+            SavedSearchMatch.flat_id == flat.id,
+            SavedSearchMatch.saved_search_id.in_(list(matched)),
+        )
+    }
+    added = 0
+    for search_id in sorted(live - existing):
+        # A concurrent percolation of the same flat can record the match first; uq_saved_search_flat then
+        # rejects ours, and the savepoint keeps that from rolling back the other matches.
+        try:
+            with db.session.begin_nested():
+                db.session.add(SavedSearchMatch(saved_search_id=search_id, flat_id=flat.id))
+        except IntegrityError:
+            continue
+        added += 1
+    return added
+
+
+def percolate_flat(flat):
+    # Called after an admin flat write commits.
+    tower = db.session.get(Tower, flat.tower_id)
+    building = db.session.get(Building, tower.building_id) if tower else None
+    if building is None:
+        return 0
+    added = _record_matches(flat, building)
+    if added:
+        db.session.commit()
+    return added
+
+
+def percolate_building(building):
+    # Called after a building write that changes what its flats can match (city, state, address or
+    # coordinates) commits.
+    flats = (
+        Flat.query.join(Tower)
+        .filter(Tower.building_id == building.id)
+        .options(selectinload(Flat.amenities))
+        .all()
+    )
+    added = sum(_record_matches(flat, building) for flat in flats)
+    if added:
+        db.session.commit()
+    return added
@@ -1,6 +1,15 @@
+import math
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from users.models_users import UserProfile
+from users.facets_users import FLAT_SEARCH_FACETS
+from users.suggest_users import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT
+from users.geo_users import MAX_RADIUS_KM
+from users.amenities_users import AMENITY_MATCH_MODES, normalize_amenity_name
+from users.similar_users import SIMILAR_DEFAULT_LIMIT, SIMILAR_MAX_LIMIT
+from users.search_cache_users import normalize_search_filters
+from users.search_users import ADDRESS_MAX_LENGTH, ADDRESS_MAX_WORD_LENGTH, ADDRESS_MAX_WORDS, tokenize_words
+from common.cache import image_url
 
 
 def validate_registration_payload(payload):
@@ -131,13 +140,111 @@ def _parse_bool(value, default=True):
     return None
 
 
+FLAT_SEARCH_SORTS = ("relevance", "newest", "rent_asc", "rent_desc", "area_desc")
+
+BUILDING_FIELDS = (
+    "id",
+    "name",
+    "address",
+    "city",
+    "state",
+    "pincode",
+    "full_address",
+    "latitude",
+    "longitude",
+    "total_towers",
+    "picture_url",
+)
+BUILDING_INCLUDES = ("towers", "amenities", "stats")
+BUILDING_LIST_FIELDSET = {"fields": BUILDING_FIELDS, "include": frozenset({"amenities", "stats"})}
+BUILDING_DETAIL_FIELDSET = {
+    "fields": tuple(field for field in BUILDING_FIELDS if field != "total_towers"),
+    "include": frozenset({"towers", "amenities"}),
+}
+FLAT_FIELDS = (
+    "id",
+    "flat_number",
+    "floor_number",
+    "bhk_type",
+    "area_sqft",
+    "rent_amount",
+    "security_deposit",
+    "is_available",
+    "picture_url",
+)
+FLAT_INCLUDES = ("amenities",)
+FLAT_LIST_FIELDSET = {"fields": FLAT_FIELDS, "include": frozenset()}
+FLAT_DETAIL_FIELDSET = {"fields": FLAT_FIELDS, "include": frozenset({"amenities"})}
+
+
+def _parse_choice_list(value, allowed, name):
+    chosen = []
+    for part in str(value).split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part not in allowed:
+            return None, f"{name} must be a comma-separated list of: {', '.join(allowed)}."
+        chosen.append(part)
+    return list(dict.fromkeys(chosen)), None
+
+
+def validate_fieldset_params(args, allowed_fields, allowed_includes, default):
+    # `fields` narrows the serialized attributes (id is always kept); `include` replaces the default
+    # embedded relations, and an empty `include=` drops them all.
+    fields = default["fields"]
+    include = default["include"]
+
+    if (args.get("fields") or "").strip():
+        chosen, error = _parse_choice_list(args.get("fields"), allowed_fields, "fields")
+        if error:
+            return None, [error]
+        fields = ("id",) + tuple(field for field in chosen if field != "id")
+
+    if allowed_includes and args.get("include") is not None:
+        chosen, error = _parse_choice_list(args.get("include"), allowed_includes, "include")
+        if error:
+            return None, [error]
+        include = frozenset(chosen)
+
+    return {"fields": fields, "include": include}, None
+
+
+def _address_errors(address):
+    if not address:
+        return []
+    words = tokenize_words(address)
+    if len(address) > ADDRESS_MAX_LENGTH:
+        return [f"address must be at most {ADDRESS_MAX_LENGTH} characters."]
+    if len(words) > ADDRESS_MAX_WORDS:
+        return [f"address must have at most {ADDRESS_MAX_WORDS} words."]
+    if any(len(word) > ADDRESS_MAX_WORD_LENGTH for word in words):
+        return [f"address words must be at most {ADDRESS_MAX_WORD_LENGTH} characters."]
+    return []
+
+
 def validate_flat_search_params(args):
     errors = []
 
     address = (args.get("address") or "").strip() or None
+    errors.extend(_address_errors(address))
     city = (args.get("city") or "").strip() or None
     state = (args.get("state") or "").strip() or None
     flat_type = (args.get("flat_type") or "").strip() or None
+    cursor = (args.get("cursor") or "").strip() or None
+    after = (args.get("after") or "").strip() or None
+
+    facets = []
+    for facet in (args.get("facets") or "").split(","):
+        facet = facet.strip().lower()
+        if facet == "all":
+            facets.extend(FLAT_SEARCH_FACETS)
+        elif facet in FLAT_SEARCH_FACETS:
+            facets.append(facet)
+        elif facet:
+            errors.append(f"facets must be a comma-separated list of: all, {', '.join(FLAT_SEARCH_FACETS)}.")
+            break
+    facets = list(dict.fromkeys(facets))
 
     try:
         page = int(args.get("page", 1))
@@ -178,10 +285,48 @@ def validate_flat_search_params(args):
     if min_rent is not None and max_rent is not None and min_rent > max_rent:
         errors.append("min_rent cannot be greater than max_rent.")
 
+    near = None
+    radius_km = None
+    near_raw = (args.get("near") or "").strip()
+    if near_raw:
+        try:
+            latitude, longitude = (float(part) for part in near_raw.split(","))
+        except ValueError:
+            errors.append("near must be formatted as lat,lon.")
+        else:
+            if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+                near = [latitude, longitude]
+            else:
+                errors.append("near must be a valid latitude,longitude pair.")
+        try:
+            radius_km = float(args.get("radius_km", 5))
+        except (TypeError, ValueError):
+            errors.append("radius_km must be a number.")
+        else:
+            if not math.isfinite(radius_km) or radius_km <= 0 or radius_km > MAX_RADIUS_KM:
+                errors.append(f"radius_km must be greater than 0 and at most {MAX_RADIUS_KM}.")
+    elif args.get("radius_km") not in (None, ""):
+        errors.append("radius_km requires near.")
+
+    amenities = sorted({normalize_amenity_name(name) for name in (args.get("amenities") or "").split(",")} - {""})
+    amenities_match = (args.get("amenities_match") or "all").strip().lower()
+    if amenities_match not in AMENITY_MATCH_MODES:
+        errors.append(f"amenities_match must be one of: {', '.join(AMENITY_MATCH_MODES)}.")
+
     if page < 1:
         errors.append("page must be >= 1.")
     if per_page < 1 or per_page > 100:
         errors.append("per_page must be between 1 and 100.")
+    # Address searches rank by relevance unless another sort is asked for; then address only filters.
+    sort = (args.get("sort") or "").strip().lower() or ("relevance" if address or cursor else "newest")
+    if sort not in FLAT_SEARCH_SORTS:
+        errors.append(f"sort must be one of: {', '.join(FLAT_SEARCH_SORTS)}.")
+    elif sort == "relevance" and not (address or cursor):
+        errors.append("sort=relevance requires address.")
+    elif sort != "relevance" and cursor:
+        errors.append("cursor only applies to relevance-ranked address searches; use after instead.")
+    if after and sort == "relevance":
+        errors.append("after cannot be combined with relevance-ranked address search; use cursor instead.")
 
     if errors:
         return None, errors
@@ -194,11 +339,49 @@ def validate_flat_search_params(args):
         "available_only": available_only,
         "min_rent": min_rent,
         "max_rent": max_rent,
+        "near": near,
+        "radius_km": radius_km,
+        "amenities": amenities,
+        "amenities_match": amenities_match,
+        "cursor": cursor,
+        "after": after,
+        "facets": facets,
+        "sort": sort,
         "page": page,
         "per_page": per_page,
     }, None
 
 
+def validate_building_list_params(args):
+    errors = []
+    after = (args.get("after") or "").strip() or None
+
+    try:
+        page = int(args.get("page", 1))
+    except (TypeError, ValueError):
+        return None, ["page must be an integer."]
+
+    try:
+        per_page = int(args.get("per_page", 20))
+    except (TypeError, ValueError):
+        return None, ["per_page must be an integer."]
+
+    stream = _parse_bool(args.get("stream"), default=False)
+    if stream is None:
+        errors.append("stream must be a boolean.")
+    if page < 1:
+        errors.append("page must be >= 1.")
+    if per_page < 1 or per_page > 100:
+        errors.append("per_page must be between 1 and 100.")
+
+    if errors:
+        return None, errors
+
+    # Without page/per_page/after the listing keeps its original plain-array shape.
+    paged = any(args.get(key) not in (None, "") for key in ("page", "per_page", "after"))
+    return {"page": page, "per_page": per_page, "after": after, "stream": stream, "paged": paged}, None
+
+
 def validate_building_search_params(args):
     errors = []
 
@@ -206,6 +389,7 @@ def validate_building_search_params(args):
     address = (args.get("address") or "").strip() or None
     city = (args.get("city") or "").strip() or None
     state = (args.get("state") or "").strip() or None
+    errors.extend(_address_errors(address))
 
     try:
         page = int(args.get("page", 1))
@@ -235,6 +419,73 @@ def validate_building_search_params(args):
     }, None
 
 
+def validate_suggest_params(args):
+    query = (args.get("q") or "").strip()
+    if not query:
+        return None, ["q is required."]
+
+    try:
+        limit = int(args.get("limit", SUGGEST_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        return None, ["limit must be an integer."]
+    if limit < 1 or limit > SUGGEST_MAX_LIMIT:
+        return None, [f"limit must be between 1 and {SUGGEST_MAX_LIMIT}."]
+
+    return {"q": query, "limit": limit}, None
+
+
+def validate_similar_params(args):
+    try:
+        limit = int(args.get("limit", SIMILAR_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        return None, ["limit must be an integer."]
+    if limit < 1 or limit > SIMILAR_MAX_LIMIT:
+        return None, [f"limit must be between 1 and {SIMILAR_MAX_LIMIT}."]
+
+    return {"limit": limit}, None
+
+
+def validate_saved_search_payload(payload):
+    payload = payload or {}
+    errors = []
+
+    name = payload.get("name")
+    if name is not None:
+        name = str(name).strip() or None
+    if name and len(name) > 80:
+        errors.append("name must be at most 80 characters.")
+
+    # Same filters as GET /users/flats/search; JSON lists (near, amenities) are accepted as well.
+    args = {}
+    for key, value in payload.items():
+        if key == "name" or value is None:
+            continue
+        if isinstance(value, list):
+            value = ",".join(str(part) for part in value)
+        args[key] = value if isinstance(value, bool) else str(value)
+    for key in ("cursor", "after", "facets", "sort", "page", "per_page"):
+        args.pop(key, None)
+
+    params, param_errors = validate_flat_search_params(args)
+    errors.extend(param_errors or [])
+    if errors:
+        return None, errors
+
+    return {"name": name, "filters": normalize_search_filters(params)}, None
+
+
+def validate_saved_search_matches_params(args):
+    after = (args.get("after") or "").strip() or None
+    try:
+        per_page = int(args.get("per_page", 20))
+    except (TypeError, ValueError):
+        return None, ["per_page must be an integer."]
+    if per_page < 1 or per_page > 100:
+        return None, ["per_page must be between 1 and 100."]
+
+    return {"after": after, "per_page": per_page}, None
+
+
 def serialize_users_health():
     return {"service": "users"}
 
@@ -293,7 +544,7 @@ def serialize_user_profile(user, profile):
             "username": profile.username,
             "primary_email": user.email,
             "mobile_number": profile.mobile_number,
-            "profile_pic_url": profile.profile_pic_url,
+            "profile_pic_url": image_url(profile.profile_pic_url),
             "profile_pic_public_id": profile.profile_pic_public_id,
             "profile_pic_folder": profile.profile_pic_folder,
             "bio": profile.bio,
@@ -326,72 +577,52 @@ def serialize_amenity_summary(amenity):
     return {
         "name": amenity.name,
         "description": amenity.description,
-        "picture_url": amenity.picture_url,
+        "picture_url": image_url(amenity.picture_url),
     }
 
 
-def serialize_building_with_stats(building):
-    towers = building.towers or []
-    flats = []
-    for tower in towers:
-        flats.extend(tower.flats or [])
+def _serialize_building(building, fieldset):
+    data = {}
+    for field in fieldset["fields"]:
+        if field == "full_address":
+            data[field] = ", ".join(
+                part for part in [building.address, building.city, building.state, building.pincode] if part
+            )
+        elif field == "picture_url":
+            data[field] = image_url(building.picture_url)
+        else:
+            data[field] = getattr(building, field)
 
-    available_flats = [flat for flat in flats if flat.is_available]
-    amenities = building.amenities or []
+    include = fieldset["include"]
+    if "stats" in include:
+        data["towers_count"] = len(building.towers or [])
+        data["flats_count"] = building.flats_count
+        data["available_flats_count"] = building.available_flats_count
+    if "towers" in include:
+        data["towers"] = [serialize_tower_summary(tower) for tower in (building.towers or [])]
+    if "amenities" in include:
+        data["amenities"] = [serialize_amenity_summary(amenity) for amenity in (building.amenities or [])]
+    return data
 
-    full_address = ", ".join(
-        part for part in [building.address, building.city, building.state, building.pincode] if part
-    )
 
-    return {
-        "id": building.id,
-        "name": building.name,
-        "address": building.address,
-        "city": building.city,
-        "state": building.state,
-        "pincode": building.pincode,
-        "full_address": full_address,
-        "total_towers": building.total_towers,
-        "picture_url": building.picture_url,
-        "towers_count": len(towers),
-        "flats_count": len(flats),
-        "available_flats_count": len(available_flats),
-        "amenities": [serialize_amenity_summary(amenity) for amenity in amenities],
-    }
+def serialize_building_with_stats(building, fieldset=None):
+    return _serialize_building(building, fieldset or BUILDING_LIST_FIELDSET)
 
 
 def serialize_tower_summary(tower):
-    flats = tower.flats or []
-    available_flats = [flat for flat in flats if flat.is_available]
     return {
         "id": tower.id,
         "name": tower.name,
         "floors": tower.floors,
         "total_flats": tower.total_flats,
-        "picture_url": tower.picture_url,
-        "flats_count": len(flats),
-        "available_flats_count": len(available_flats),
+        "picture_url": image_url(tower.picture_url),
+        "flats_count": tower.flats_count,
+        "available_flats_count": tower.available_flats_count,
     }
 
 
-def serialize_building_detail(building):
-    towers = building.towers or []
-    amenities = building.amenities or []
-    full_address = ", ".join(
-        part for part in [building.address, building.city, building.state, building.pincode] if part
-    )
-    return {
-        "id": building.id,
-        "name": building.name,
-        "address": building.address,
-        "city": building.city,
-        "state": building.state,
-        "pincode": building.pincode,
-        "full_address": full_address,
-        "picture_url": building.picture_url,
-        "towers": [serialize_tower_summary(tower) for tower in towers],
-        "amenities": [serialize_amenity_summary(amenity) for amenity in amenities],
-    }
+def serialize_building_detail(building, fieldset=None):
+    return _serialize_building(building, fieldset or BUILDING_DETAIL_FIELDSET)
 
 
 def serialize_building_address(building):
@@ -408,42 +639,40 @@ def serialize_building_address(building):
 
 
 def serialize_tower_detail_with_building(tower, building):
-    flats = tower.flats or []
-    available_flats = [flat for flat in flats if flat.is_available]
     return {
         "tower": {
             "id": tower.id,
             "name": tower.name,
             "floors": tower.floors,
             "total_flats": tower.total_flats,
-            "picture_url": tower.picture_url,
-            "flats_count": len(flats),
-            "available_flats_count": len(available_flats),
+            "picture_url": image_url(tower.picture_url),
+            "flats_count": tower.flats_count,
+            "available_flats_count": tower.available_flats_count,
         },
         "building": {
             "id": building.id,
             "name": building.name,
-            "picture_url": building.picture_url,
+            "picture_url": image_url(building.picture_url),
             **serialize_building_address(building),
         },
     }
 
 
-def serialize_flat_summary(flat):
-    return {
-        "id": flat.id,
-        "flat_number": flat.flat_number,
-        "floor_number": flat.floor_number,
-        "bhk_type": flat.bhk_type,
-        "area_sqft": flat.area_sqft,
-        "rent_amount": str(flat.rent_amount),
-        "security_deposit": str(flat.security_deposit),
-        "is_available": flat.is_available,
-        "picture_url": flat.picture_url,
-    }
-
-
-def serialize_flats_response(flats, tower, building, page, per_page, total, total_pages):
+def serialize_flat_summary(flat, fields=FLAT_FIELDS):
+    data = {}
+    for field in fields:
+        value = getattr(flat, field)
+        if field in ("rent_amount", "security_deposit"):
+            value = str(value)
+        elif field == "picture_url":
+            value = image_url(value)
+        data[field] = value
+    return data
+
+
+def serialize_flats_response(
+    flats, tower, building, page, per_page, total, total_pages, next_cursor=None, fields=FLAT_FIELDS
+):
     return {
         "building": {
             "id": building.id,
@@ -460,19 +689,107 @@ def serialize_flats_response(flats, tower, building, page, per_page, total, tota
             "id": tower.id,
             "name": tower.name,
         },
-        "items": [serialize_flat_summary(flat) for flat in flats],
+        "items": [serialize_flat_summary(flat, fields) for flat in flats],
         "page": page,
         "per_page": per_page,
         "total": total,
         "total_pages": total_pages,
+        "next_cursor": next_cursor,
     }
 
 
-def serialize_flat_search_response(rows, page, per_page, total, total_pages):
+def serialize_flat_search_response(
+    rows,
+    page,
+    per_page,
+    total,
+    total_pages,
+    cursor=None,
+    next_cursor=None,
+    facets=None,
+    distances=None,
+    fields=FLAT_FIELDS,
+):
     items = []
     for flat, tower, building in rows:
-        items.append(
+        item = {
+            "flat": serialize_flat_summary(flat, fields),
+            "tower": {
+                "id": tower.id,
+                "name": tower.name,
+            },
+            "building": {
+                "id": building.id,
+                "name": building.name,
+                "address": building.address,
+                "city": building.city,
+                "state": building.state,
+                "pincode": building.pincode,
+                "full_address": ", ".join(
+                    part
+                    for part in [building.address, building.city, building.state, building.pincode]
+                    if part
+                ),
+                "latitude": building.latitude,
+                "longitude": building.longitude,
+            },
+        }
+        if distances is not None:
+            item["building"]["distance_km"] = round(distances.get(building.id, 0.0), 3)
+        items.append(item)
+
+    return {
+        "items": items,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_pages": total_pages,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "facets": facets,
+    }
+
+
+def serialize_similar_flats_response(flat_id, rows, distances, fields=FLAT_FIELDS):
+    return {
+        "flat_id": flat_id,
+        "items": [
             {
+                "flat": serialize_flat_summary(flat, fields),
+                "tower": {
+                    "id": tower.id,
+                    "name": tower.name,
+                },
+                "building": {
+                    "id": building.id,
+                    "name": building.name,
+                    "city": building.city,
+                    "state": building.state,
+                },
+                "distance": round(distances[flat.id], 4),
+            }
+            for flat, tower, building in rows
+        ],
+    }
+
+
+def serialize_saved_search(saved_search, match_count=0):
+    return {
+        "id": saved_search.id,
+        "name": saved_search.name,
+        "filters": saved_search.filters,
+        "match_count": match_count,
+        "created_at": saved_search.created_at.isoformat(),
+    }
+
+
+def serialize_saved_search_matches_response(saved_search, rows, per_page, next_cursor):
+    return {
+        "saved_search": {"id": saved_search.id, "name": saved_search.name},
+        "items": [
+            {
+                "match_id": match.id,
+                "matched_at": match.matched_at.isoformat(),
                 "flat": serialize_flat_summary(flat),
                 "tower": {
                     "id": tower.id,
@@ -481,31 +798,31 @@ def serialize_flat_search_response(rows, page, per_page, total, total_pages):
                 "building": {
                     "id": building.id,
                     "name": building.name,
-                    "address": building.address,
                     "city": building.city,
                     "state": building.state,
-                    "pincode": building.pincode,
-                    "full_address": ", ".join(
-                        part
-                        for part in [building.address, building.city, building.state, building.pincode]
-                        if part
-                    ),
                 },
             }
-        )
+            for match, flat, tower, building in rows
+        ],
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+    }
 
+
+def serialize_building_list_response(buildings, page, per_page, total, total_pages, next_cursor, fieldset=None):
     return {
-        "items": items,
+        "items": [serialize_building_with_stats(building, fieldset) for building in buildings],
         "page": page,
         "per_page": per_page,
         "total": total,
         "total_pages": total_pages,
+        "next_cursor": next_cursor,
     }
 
 
-def serialize_building_search_response(buildings, page, per_page, total, total_pages):
+def serialize_building_search_response(buildings, page, per_page, total, total_pages, fieldset=None):
     return {
-        "items": [serialize_building_with_stats(building) for building in buildings],
+        "items": [serialize_building_with_stats(building, fieldset) for building in buildings],
         "page": page,
         "per_page": per_page,
         "total": total,
@@ -513,9 +830,10 @@ def serialize_building_search_response(buildings, page, per_page, total, total_p
     }
 
 
-def serialize_flat_detail(flat, tower, building):
-    return {
-        "flat": serialize_flat_summary(flat),
+def serialize_flat_detail(flat, tower, building, fieldset=None):
+    fieldset = fieldset or FLAT_DETAIL_FIELDSET
+    data = {
+        "flat": serialize_flat_summary(flat, fieldset["fields"]),
         "tower": {
             "id": tower.id,
             "name": tower.name,
@@ -531,8 +849,10 @@ def serialize_flat_detail(flat, tower, building):
                 part for part in [building.address, building.city, building.state, building.pincode] if part
             ),
         },
-        "amenities": [serialize_amenity_summary(amenity) for amenity in (flat.amenities or [])],
     }
+    if "amenities" in fieldset["include"]:
+        data["amenities"] = [serialize_amenity_summary(amenity) for amenity in (flat.amenities or [])]
+    return data
 
 
 def serialize_booking(booking):
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from users.search_users import tokenize_words
+
+
+CURSOR_SALT = "flat-search-cursor"
+SNAPSHOT_FILTER_KEYS = (
+    "address",
+    "city",
+    "state",
+    "flat_type",
+    "min_rent",
+    "max_rent",
+    "available_only",
+    "near",
+    "radius_km",
+    "amenities",
+    "amenities_match",
+)
+
+
+def normalize_search_filters(params):
+    # Filters that decide the ranked result set; page/per_page only pick a slice of it.
+    return {
+        "address": " ".join(tokenize_words(params.get("address"))) or None,
+        "city": (params.get("city") or "").lower() or None,
+        "state": (params.get("state") or "").lower() or None,
+        "flat_type": (params.get("flat_type") or "").lower() or None,
+        "min_rent": str(params["min_rent"]) if params.get("min_rent") is not None else None,
+        "max_rent": str(params["max_rent"]) if params.get("max_rent") is not None else None,
+        "available_only": bool(params.get("available_only")),
+        "near": list(params["near"]) if params.get("near") else None,
+        "radius_km": params.get("radius_km") if params.get("near") else None,
+        "amenities": list(params.get("amenities") or []) or None,
+        "amenities_match": params.get("amenities_match") if params.get("amenities") else None,
+    }
+
+
+def snapshot_key(filters):
+    return tuple(
+        tuple(filters[key]) if isinstance(filters[key], list) else filters[key] for key in SNAPSHOT_FILTER_KEYS
+    )
+
+
+def _cursor_serializer():
+    return URLSafeSerializer(current_app.config["JWT_SECRET_KEY"], salt=CURSOR_SALT)
+
+
+def encode_search_cursor(filters):
+    return _cursor_serializer().dumps(filters)
+
+
+def decode_search_cursor(token):
+    try:
+        filters = _cursor_serializer().loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(filters, dict) or set(filters) != set(SNAPSHOT_FILTER_KEYS):
+        return None
+    return filters
+
+
+class RankedSnapshotCache:
+    # Per-worker LRU of ranked flat id prefixes (at most SEARCH_SNAPSHOT_MAX_IDS) with the full match
+    # count. Entries expire after a TTL and are ignored once the catalog version they were built
+    # against is no longer current.
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _settings(self):
+        cfg = current_app.config
+        return (
+            int(cfg.get("SEARCH_SNAPSHOT_TTL_SECONDS", 300)),
+            int(cfg.get("SEARCH_SNAPSHOT_MAX_ENTRIES", 256)),
+            int(cfg.get("SEARCH_SNAPSHOT_MAX_IDS", 20000)),
+        )
+
+    def max_ids(self):
+        return self._settings()[2]
+
+    def has(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, version):
+        ttl, _, _ = self._settings()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, created_at, ranked_ids, total = entry
+            if entry_version != version or now - created_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return ranked_ids, total
+
+    def put(self, key, version, ranked_ids, total):
+        ttl, max_entries, max_ids = self._settings()
+        if ttl <= 0 or max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), tuple(ranked_ids[:max_ids]), total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+flat_search_snapshots = RankedSnapshotCache()
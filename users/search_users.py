@@ -0,0 +1,330 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from flask import current_app, has_app_context
+from sqlalchemy import Float, case, cast, func, literal, or_, select, union_all
+from extensions import db
+from admins.models_admins import Building, BuildingAddressToken
+from users.fuzzy_users import fuzzy_address_terms
+from common.catalog_version import BUILDINGS_SCOPE, bump_catalog_version
+
+
+ADDRESS_TOKEN_CACHE_SIZE = 16384
+
+
+# Request limits: candidate lookup binds every substring of each query word, so word length and
+# count bound the parameters sent per search.
+ADDRESS_MAX_LENGTH = 200
+ADDRESS_MAX_WORDS = 8
+ADDRESS_MAX_WORD_LENGTH = 30
+
+
+def tokenize_words(value):
+    if value is None:
+        return []
+    return re.findall(r"[a-z0-9]+", str(value).lower())
+
+
+def search_tuning():
+    cfg = current_app.config if has_app_context() else {}
+    return {
+        "strong_ratio": float(cfg.get("ADDRESS_MATCH_STRONG_RATIO", 0.8)),
+        "medium_ratio": float(cfg.get("ADDRESS_MATCH_MEDIUM_RATIO", 0.5)),
+        "score_exact": float(cfg.get("ADDRESS_SCORE_EXACT", 100)),
+        "score_strong": float(cfg.get("ADDRESS_SCORE_STRONG_PARTIAL", 80)),
+        "score_medium": float(cfg.get("ADDRESS_SCORE_MEDIUM_PARTIAL", 55)),
+        "score_weak": float(cfg.get("ADDRESS_SCORE_WEAK_PARTIAL", 30)),
+        "score_fuzzy": float(cfg.get("ADDRESS_SCORE_FUZZY", 45)),
+        "fuzzy_max_distance": int(cfg.get("ADDRESS_FUZZY_MAX_DISTANCE", 2)),
+        "min_include": float(cfg.get("ADDRESS_SCORE_MIN_INCLUDE", 1)),
+    }
+
+
+def single_word_score(query_word, address_word, tuning=None):
+    if not query_word or not address_word:
+        return 0.0
+
+    if query_word == address_word:
+        return (tuning or search_tuning())["score_exact"]
+
+    if query_word in address_word or address_word in query_word:
+        tuning = tuning or search_tuning()
+        smaller = min(len(query_word), len(address_word))
+        larger = max(len(query_word), len(address_word))
+        ratio = smaller / larger if larger else 0.0
+
+        if ratio >= tuning["strong_ratio"]:
+            return tuning["score_strong"]
+        if ratio >= tuning["medium_ratio"]:
+            return tuning["score_medium"]
+        return tuning["score_weak"]
+
+    return 0.0
+
+
+@lru_cache(maxsize=ADDRESS_TOKEN_CACHE_SIZE)
+def _cached_address_words(building_id, address):
+    # Keyed by (building id, address) so an edited address never reuses stale tokens.
+    return tuple(dict.fromkeys(tokenize_words(address)))
+
+
+class AddressScorer:
+    # Built once per search: snapshots tuning, pre-tokenizes the query, expands each word into its
+    # fuzzy vocabulary neighbours and memoizes word pair scores.
+    def __init__(self, search_address, tuning=None):
+        self.tuning = tuning or search_tuning()
+        self.min_include = self.tuning["min_include"]
+        self.query_words = tokenize_words(search_address)
+        self._fuzzy_terms = [fuzzy_address_terms(word, self.tuning) for word in self.query_words]
+        self._word_scores = [{} for _ in self.query_words]
+
+    def _best_word_score(self, index, address_words):
+        query_word = self.query_words[index]
+        fuzzy_terms = self._fuzzy_terms[index]
+        memo = self._word_scores[index]
+        best = 0.0
+        for address_word in address_words:
+            score = memo.get(address_word)
+            if score is None:
+                score = single_word_score(query_word, address_word, self.tuning)
+                if address_word in fuzzy_terms and self.tuning["score_fuzzy"] > score:
+                    score = self.tuning["score_fuzzy"]
+                memo[address_word] = score
+            if score > best:
+                best = score
+        return best
+
+    def score(self, candidate_address, building_id=None):
+        if not self.query_words:
+            return 0.0
+
+        if building_id is None:
+            address_words = tokenize_words(candidate_address)
+        else:
+            address_words = _cached_address_words(building_id, candidate_address)
+        if not address_words:
+            return 0.0
+
+        total = 0.0
+        for index in range(len(self.query_words)):
+            total += self._best_word_score(index, address_words)
+        return total / len(self.query_words)
+
+    def includes(self, score):
+        return score >= self.min_include
+
+
+def address_word_match_score(search_address, candidate_address):
+    return AddressScorer(search_address).score(candidate_address)
+
+
+def select_top_buildings(scorer, building_rows, limit):
+    # Streams (building_id, address) rows through a bounded min-heap of size `limit`.
+    # Returns the top matches as [(score, building_id)] best-first, plus the total match count.
+    heap = []
+    total = 0
+    for building_id, address in building_rows:
+        score = scorer.score(address, building_id)
+        if not scorer.includes(score):
+            continue
+        total += 1
+        item = (score, building_id)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return sorted(heap, reverse=True), total
+
+
+def select_top_building_groups(scorer, building_rows, limit, slack=0.0):
+    # Streams (building_id, address, flat_count) rows, scoring each building once.
+    scored_rows = (
+        (building_id, scorer.score(address, building_id), flat_count)
+        for building_id, address, flat_count in building_rows
+    )
+    return select_top_scored_groups(
+        ((building_id, score, flat_count) for building_id, score, flat_count in scored_rows if scorer.includes(score)),
+        limit,
+        slack,
+    )
+
+
+def select_top_scored_groups(scored_rows, limit, slack=0.0):
+    # Streams (building_id, score, flat_count) rows and keeps only the best-scoring buildings
+    # needed to cover the first `limit` flats (all of them when `limit` is None). Buildings tied
+    # on score interleave their flats, so a score level is only dropped when the levels above it
+    # already cover `limit` flats. With `slack` (the most a flat can gain on top of its building's
+    # score when ranking is blended), only levels more than `slack` above it count.
+    # Returns ({building_id: score} for kept buildings, total matching flats).
+    heap = []
+    level_flats = defaultdict(int)
+    kept_flats = 0
+    total = 0
+    for building_id, score, flat_count in scored_rows:
+        if not flat_count:
+            continue
+        total += flat_count
+        heapq.heappush(heap, (score, building_id, flat_count))
+        level_flats[score] += flat_count
+        kept_flats += flat_count
+
+        while limit is not None and heap:
+            lowest = heap[0][0]
+            if slack:
+                above = sum(count for level, count in level_flats.items() if level > lowest + slack)
+            else:
+                above = kept_flats - level_flats[lowest]
+            if above < limit:
+                break
+            while heap and heap[0][0] == lowest:
+                heapq.heappop(heap)
+            kept_flats -= level_flats.pop(lowest)
+
+    return {building_id: score for score, building_id, _ in heap}, total
+
+
+# Address token index: one row per distinct word of Building.address, so address
+# search only scores buildings that share at least one matching word with the query.
+def _word_substrings(word):
+    return {word[start:end] for start in range(len(word)) for end in range(start + 1, len(word) + 1)}
+
+
+def _substring_condition(word):
+    # Query word inside an indexed token, or an indexed token inside the query word.
+    return or_(
+        BuildingAddressToken.token.like(f"%{word}%"),
+        BuildingAddressToken.token.in_(_word_substrings(word)),
+    )
+
+
+def address_token_conditions(query_words, tuning=None):
+    tuning = tuning or search_tuning()
+    conditions = []
+    for word in set(query_words):
+        conditions.append(_substring_condition(word))
+        fuzzy_terms = fuzzy_address_terms(word, tuning)
+        if fuzzy_terms:
+            conditions.append(BuildingAddressToken.token.in_(fuzzy_terms))
+    return conditions
+
+
+def address_candidate_ids(query_words, tuning=None):
+    conditions = address_token_conditions(query_words, tuning)
+    if not conditions:
+        return None
+    return select(BuildingAddressToken.building_id).where(or_(*conditions)).distinct()
+
+
+def filter_address_candidates(query, search_address):
+    # With a non-positive include threshold every building qualifies, so there is nothing to prune.
+    tuning = search_tuning()
+    if tuning["min_include"] <= 0:
+        return query
+
+    candidate_ids = address_candidate_ids(tokenize_words(search_address), tuning)
+    if candidate_ids is None:
+        return query.filter(db.false())
+    return query.filter(Building.id.in_(candidate_ids))
+
+
+# SQL ranking backend: the same exact/strong/medium/weak tiers evaluated over the token index,
+# so PostgreSQL (trigram GIN index on the token column) returns only the ranked page.
+def sql_address_ranking_enabled():
+    if not has_app_context():
+        return False
+    backend = str(current_app.config.get("ADDRESS_SEARCH_BACKEND", "python")).strip().lower()
+    if backend != "postgres":
+        return False
+    if db.session.get_bind().dialect.name != "postgresql":
+        return False
+    # Zero-score buildings are only reachable through the Python path.
+    return search_tuning()["min_include"] > 0
+
+
+def _sql_word_score(word, tuning):
+    token = BuildingAddressToken.token
+    token_length = cast(func.length(token), Float)
+    word_length = cast(literal(len(word)), Float)
+    ratio = case(
+        (token.like(f"%{word}%"), word_length / token_length),
+        else_=token_length / word_length,
+    )
+    # Tokens are [a-z0-9]+, so a token inside the word is a LIKE with the token as the pattern and no
+    # substring list is bound per CASE.
+    token_in_word = literal(word).like(literal("%") + token + literal("%"))
+    score = case(
+        (token == word, tuning["score_exact"]),
+        (~(token.like(f"%{word}%") | token_in_word), 0.0),
+        (ratio >= tuning["strong_ratio"], tuning["score_strong"]),
+        (ratio >= tuning["medium_ratio"], tuning["score_medium"]),
+        else_=tuning["score_weak"],
+    )
+    fuzzy_terms = fuzzy_address_terms(word, tuning)
+    if fuzzy_terms:
+        # Fuzzy neighbours score the better of their substring tier and the fuzzy weight.
+        score = case(
+            (token.in_(fuzzy_terms) & (score < tuning["score_fuzzy"]), tuning["score_fuzzy"]),
+            else_=score,
+        )
+    return score
+
+
+def sql_address_scores(search_address, tuning=None):
+    # Subquery of (building_id, score) for buildings at or above the include threshold.
+    tuning = tuning or search_tuning()
+    query_words = tokenize_words(search_address)
+    if not query_words:
+        return None
+
+    word_selects = []
+    for word, repeats in Counter(query_words).items():
+        word_selects.append(
+            select(
+                BuildingAddressToken.building_id.label("building_id"),
+                (func.max(_sql_word_score(word, tuning)) * repeats).label("word_score"),
+            )
+            .where(or_(*address_token_conditions([word], tuning)))
+            .group_by(BuildingAddressToken.building_id)
+        )
+
+    if len(word_selects) == 1:
+        word_scores = word_selects[0].subquery("address_word_scores")
+    else:
+        word_scores = union_all(*word_selects).subquery("address_word_scores")
+
+    score = func.sum(word_scores.c.word_score) / cast(literal(len(query_words)), Float)
+    return (
+        select(word_scores.c.building_id, score.label("score"))
+        .group_by(word_scores.c.building_id)
+        .having(score >= tuning["min_include"])
+        .subquery("address_scores")
+    )
+
+
+def sync_building_address_tokens(building):
+    tokens = set(tokenize_words(building.address))
+    existing = {row.token: row for row in (building.address_tokens or [])}
+
+    for token, row in existing.items():
+        if token not in tokens:
+            building.address_tokens.remove(row)
+    for token in tokens - set(existing):
+        building.address_tokens.append(BuildingAddressToken(token=token))
+
+
+def rebuild_address_token_index():
+    BuildingAddressToken.query.delete()
+    db.session.flush()
+
+    count = 0
+    for building_id, address in db.session.query(Building.id, Building.address).yield_per(500):
+        for token in set(tokenize_words(address)):
+            db.session.add(BuildingAddressToken(building_id=building_id, token=token))
+        count += 1
+
+    # Per-worker indexes built from the token table (fuzzy vocabulary) rebuild on the next version check.
+    bump_catalog_version()
+    bump_catalog_version(BUILDINGS_SCOPE)
+    db.session.commit()
+    return count
@@ -1,22 +1,63 @@
 from flask_jwt_extended import create_access_token
 from uuid import uuid4
-import re
-from flask import current_app, has_app_context
 from extensions import db
 import cloudinary
 import cloudinary.uploader
 import os
-from users.models_users import RegistrationUser, UserProfile, RevokedToken
+from users.models_users import RegistrationUser, UserProfile, RevokedToken, SavedSearch, SavedSearchMatch
 from admins.models_admins import Building, Tower, Flat, Booking, Amenity
-from sqlalchemy.orm import selectinload
+from decimal import Decimal
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import load_only, selectinload
 from common.image_compression import compress_image_to_100kb
+from users.search_users import (
+    AddressScorer,
+    filter_address_candidates,
+    select_top_buildings,
+    select_top_building_groups,
+    select_top_scored_groups,
+    sql_address_ranking_enabled,
+    sql_address_scores,
+)
+from users.facets_users import flat_search_facets
+from users.suggest_users import building_suggestions
+from users.geo_users import buildings_within_radius
+from users.amenities_users import flat_amenities_condition
+from users.similar_users import flat_feature_matrix, similar_flat_features
+from users.revoked_tokens_users import record_user_deletion, revoked_token_cache
+from users.saved_searches_users import SAVED_SEARCH_MAX_PER_USER, saved_search_index
+from users.popularity_users import (
+    blended_ranking_enabled,
+    count_booking_activity,
+    max_rank_boost,
+    rank_flats_blended,
+    rank_tuning,
+    refresh_booking_popularity,
+)
+from users.search_cache_users import (
+    flat_search_snapshots,
+    normalize_search_filters,
+    snapshot_key,
+    encode_search_cursor,
+    decode_search_cursor,
+)
+from common.catalog_version import BOOKINGS_SCOPE, ROLES_SCOPE, SAVED_SEARCHES_SCOPE, bump_catalog_version, current_catalog_version
+from common.permissions import refresh_user_role, remove_user_role, role_claims, role_for_user
+from common.locations import filter_by_location
+from common.pagination import encode_keyset_cursor, decode_keyset_cursor, keyset_after
 from users.schemas_users import (
     validate_registration_payload,
     validate_login_payload,
     validate_update_payload,
     validate_update_profile_payload,
     validate_flat_search_params,
+    validate_building_list_params,
+    validate_fieldset_params,
     validate_building_search_params,
+    validate_suggest_params,
+    validate_similar_params,
+    validate_saved_search_payload,
+    validate_saved_search_matches_params,
     serialize_registration_response,
     serialize_login_response,
     serialize_me_response,
@@ -32,13 +73,40 @@ from users.schemas_users import (
     serialize_flat_summary,
     serialize_flats_response,
     serialize_flat_search_response,
+    serialize_building_list_response,
     serialize_building_search_response,
+    serialize_similar_flats_response,
+    serialize_saved_search,
+    serialize_saved_search_matches_response,
     serialize_flat_detail,
     serialize_tower_summary,
     serialize_booking,
+    BUILDING_FIELDS,
+    BUILDING_INCLUDES,
+    BUILDING_LIST_FIELDSET,
+    BUILDING_DETAIL_FIELDSET,
+    FLAT_FIELDS,
+    FLAT_INCLUDES,
+    FLAT_LIST_FIELDSET,
+    FLAT_DETAIL_FIELDSET,
 )
 
 
+SEARCH_STREAM_BATCH_SIZE = 500
+FLAT_KEYSET_SORT = "newest"
+BUILDING_KEYSET_SORT = "buildings-newest"
+# Serialized building fields that read other columns than their own name.
+BUILDING_FIELD_COLUMNS = {"full_address": ("address", "city", "state", "pincode")}
+SAVED_SEARCH_MATCHES_SORT = "saved-search-matches"
+# Sort name -> (key columns, descending). Every key ends in Flat.id so keyset seeks are unique and
+# each order matches one of the composite indexes declared on Flat.
+FLAT_SORTS = {
+    "newest": ((Flat.id,), True),
+    "rent_asc": ((Flat.rent_amount, Flat.id), False),
+    "rent_desc": ((Flat.rent_amount, Flat.id), True),
+    "area_desc": ((Flat.area_sqft, Flat.id), True),
+}
+
 
 def _error(status_code, message, user_message):
     return {
@@ -48,69 +116,6 @@ def _error(status_code, message, user_message):
     }
 
 
-def _tokenize_words(value):
-    if value is None:
-        return []
-    return re.findall(r"[a-z0-9]+", str(value).lower())
-
-
-def _search_tuning():
-    cfg = current_app.config if has_app_context() else {}
-    return {
-        "strong_ratio": float(cfg.get("ADDRESS_MATCH_STRONG_RATIO", 0.8)),
-        "medium_ratio": float(cfg.get("ADDRESS_MATCH_MEDIUM_RATIO", 0.5)),
-        "score_exact": float(cfg.get("ADDRESS_SCORE_EXACT", 100)),
-        "score_strong": float(cfg.get("ADDRESS_SCORE_STRONG_PARTIAL", 80)),
-        "score_medium": float(cfg.get("ADDRESS_SCORE_MEDIUM_PARTIAL", 55)),
-        "score_weak": float(cfg.get("ADDRESS_SCORE_WEAK_PARTIAL", 30)),
-        "min_include": float(cfg.get("ADDRESS_SCORE_MIN_INCLUDE", 1)),
-    }
-
-
-def _single_word_score(query_word, address_word):
-    if not query_word or not address_word:
-        return 0.0
-
-    if query_word == address_word:
-        return _search_tuning()["score_exact"]
-
-    if query_word in address_word or address_word in query_word:
-        tuning = _search_tuning()
-        smaller = min(len(query_word), len(address_word))
-        larger = max(len(query_word), len(address_word))
-        ratio = smaller / larger if larger else 0.0
-
-        if ratio >= tuning["strong_ratio"]:
-            return tuning["score_strong"]
-        if ratio >= tuning["medium_ratio"]:
-            return tuning["score_medium"]
-        return tuning["score_weak"]
-
-    return 0.0
-
-
-def _address_word_match_score(search_address, candidate_address):
-    query_words = _tokenize_words(search_address)
-    address_words = _tokenize_words(candidate_address)
-
-    if not query_words or not address_words:
-        return 0.0
-
-    per_word_scores = []
-    for query_word in query_words:
-        best = 0.0
-        for address_word in address_words:
-            score = _single_word_score(query_word, address_word)
-            if score > best:
-                best = score
-        per_word_scores.append(best)
-
-    if not per_word_scores:
-        return 0.0
-
-    return sum(per_word_scores) / len(per_word_scores)
-
-
 def _serialize_manager(admin_user, admin_profile):
     name = None
     phone = None
@@ -125,14 +130,6 @@ def _serialize_manager(admin_user, admin_profile):
     }
 
 
-def _role_for_user(user):
-    if user.is_master:
-        return "master"
-    if user.is_admin:
-        return "admin"
-    return "user"
-
-
 def _get_user_by_identity(identity):
     try:
         user_id = int(identity)
@@ -150,10 +147,19 @@ def register_user(payload):
     )
     user.set_password(payload["password"])
     db.session.add(user)
+    # Plain users match the role map's default entry, so only a privileged registration changes it.
+    privileged = role_for_user(user) != "user"
+    if privileged:
+        bump_catalog_version(ROLES_SCOPE)
     db.session.commit()
+    if privileged:
+        refresh_user_role(user)
 
-    token = create_access_token(identity=str(user.id), additional_claims={"nonce": str(uuid4())})
-    role = _role_for_user(user)
+    token = create_access_token(
+        identity=str(user.id),
+        additional_claims={"nonce": str(uuid4()), **role_claims(user)},
+    )
+    role = role_for_user(user)
 
     return {
         "user": user,
@@ -167,8 +173,11 @@ def login_user(payload):
     if not user or not user.check_password(payload["password"]):
         return None, None
 
-    token = create_access_token(identity=str(user.id), additional_claims={"nonce": str(uuid4())})
-    role = _role_for_user(user)
+    token = create_access_token(
+        identity=str(user.id),
+        additional_claims={"nonce": str(uuid4()), **role_claims(user)},
+    )
+    role = role_for_user(user)
     return user, {"role": role, "token": token}
 
 
@@ -176,7 +185,7 @@ def get_user_profile(identity):
     user = _get_user_by_identity(identity)
     if not user:
         return None, None
-    role = _role_for_user(user)
+    role = role_for_user(user)
     return user, role
 
 
@@ -246,7 +255,7 @@ def update_user(identity, payload):
         user.set_password(payload["password"])
 
     db.session.commit()
-    role = _role_for_user(user)
+    role = role_for_user(user)
     return user, role
 
 
@@ -254,8 +263,14 @@ def delete_user(identity):
     user = _get_user_by_identity(identity)
     if not user:
         return None
+    if user.saved_searches:
+        bump_catalog_version(SAVED_SEARCHES_SCOPE)
+    bump_catalog_version(ROLES_SCOPE)
+    user_id = user.id
+    record_user_deletion(user_id)
     db.session.delete(user)
     db.session.commit()
+    remove_user_role(user_id)
     return user
 
 
@@ -476,10 +491,12 @@ def logout_service(identity, jwt_payload):
     if not jti:
         return None, _error(401, "Unauthorized", "Invalid token.")
 
-    existing = RevokedToken.query.filter_by(jti=jti).first()
-    if not existing:
-        db.session.add(RevokedToken(jti=jti, user_id=user.id))
+    revoked = RevokedToken.query.filter_by(jti=jti).first()
+    if not revoked:
+        revoked = RevokedToken(jti=jti, user_id=user.id)
+        db.session.add(revoked)
         db.session.commit()
+    revoked_token_cache.add(jti, revoked.revoked_at)
 
     return {
         "status_code": 200,
@@ -488,41 +505,113 @@ def logout_service(identity, jwt_payload):
     }, None
 
 
-def list_buildings_service():
-    # Service: List all buildings with tower/flat counts and amenities.
-    buildings = (
-        Building.query.options(
-            selectinload(Building.towers).selectinload(Tower.flats),
-            selectinload(Building.amenities),
-        )
-        .order_by(Building.id.desc())
-        .all()
-    )
+def _building_load_options(fieldset):
+    # Loads only the columns and relations the fieldset serializes; stats need tower ids for the count.
+    columns = {"id"}
+    for field in fieldset["fields"]:
+        columns.update(BUILDING_FIELD_COLUMNS.get(field, (field,)))
+    include = fieldset["include"]
+    if "stats" in include:
+        columns.update(("flats_count", "available_flats_count"))
+
+    options = [load_only(*[getattr(Building, column) for column in sorted(columns)])]
+    if "towers" in include:
+        options.append(selectinload(Building.towers))
+    elif "stats" in include:
+        options.append(selectinload(Building.towers).load_only(Tower.id))
+    if "amenities" in include:
+        options.append(selectinload(Building.amenities))
+    return options
+
+
+def _flat_load_options(fieldset, *extra_columns):
+    columns = {"id", "tower_id", *fieldset["fields"], *(column.key for column in extra_columns)}
+    options = [load_only(*[getattr(Flat, column) for column in sorted(columns)])]
+    if "amenities" in fieldset["include"]:
+        options.append(selectinload(Flat.amenities))
+    return options
+
+
+def _stream_buildings(query, fieldset):
+    # Server-side cursor in batches; each building is serialized as it arrives, so memory stays flat.
+    for building in query.yield_per(SEARCH_STREAM_BATCH_SIZE):
+        yield serialize_building_with_stats(building, fieldset)
+
+
+def list_buildings_service(args):
+    # Service: List buildings with tower/flat counts and amenities; all of them by default, or by page,
+    # keyset (after) or streamed when asked.
+    params, errors = validate_building_list_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+    fieldset, errors = validate_fieldset_params(args, BUILDING_FIELDS, BUILDING_INCLUDES, BUILDING_LIST_FIELDSET)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    after_values = None
+    if params["after"]:
+        after_values = decode_keyset_cursor(params["after"], BUILDING_KEYSET_SORT)
+        if after_values is None:
+            return None, _error(400, "Validation Error", "after is invalid.")
+
+    query = Building.query.options(*_building_load_options(fieldset))
+    if after_values is not None:
+        query = query.filter(keyset_after([Building.id], after_values, descending=True))
+    query = query.order_by(Building.id.desc())
+
+    if params["stream"]:
+        return {
+            "status_code": 200,
+            "message": "Buildings fetched",
+            "stream": _stream_buildings(query, fieldset),
+        }, None
+
+    if not params["paged"]:
+        return {
+            "status_code": 200,
+            "message": "Buildings fetched",
+            "data": [serialize_building_with_stats(building, fieldset) for building in query],
+        }, None
+
+    page = params["page"]
+    per_page = params["per_page"]
+    if after_values is not None:
+        buildings = query.limit(per_page + 1).all()
+        has_more = len(buildings) > per_page
+        buildings = buildings[:per_page]
+        page = total = total_pages = None
+    else:
+        total = Building.query.count()
+        total_pages = (total + per_page - 1) // per_page
+        buildings = query.offset((page - 1) * per_page).limit(per_page).all()
+        has_more = page < total_pages
+    next_cursor = encode_keyset_cursor(BUILDING_KEYSET_SORT, [buildings[-1].id]) if has_more and buildings else None
 
     return {
         "status_code": 200,
         "message": "Buildings fetched",
-        "data": [serialize_building_with_stats(building) for building in buildings],
+        "data": serialize_building_list_response(
+            buildings, page, per_page, total, total_pages, next_cursor, fieldset
+        ),
     }, None
 
 
-def get_building_detail_service(building_id):
-    # Service: Fetch a single building with towers and amenities.
-    building = (
-        Building.query.options(
-            selectinload(Building.towers).selectinload(Tower.flats),
-            selectinload(Building.amenities),
-        )
-        .filter_by(id=building_id)
-        .first()
+def get_building_detail_service(building_id, args=None):
+    # Service: Fetch a single building with towers and amenities (narrowed by fields/include).
+    fieldset, errors = validate_fieldset_params(
+        args or {}, BUILDING_FIELDS, BUILDING_INCLUDES, BUILDING_DETAIL_FIELDSET
     )
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    building = Building.query.options(*_building_load_options(fieldset)).filter_by(id=building_id).first()
     if not building:
         return None, _error(404, "Not Found", "Building not found.")
 
     return {
         "status_code": 200,
         "message": "Building fetched",
-        "data": serialize_building_detail(building),
+        "data": serialize_building_detail(building, fieldset),
     }, None
 
 
@@ -572,7 +661,7 @@ def get_tower_detail_service(building_id, tower_id):
     # Service: Fetch a tower by building with flat counts and building address.
     building = (
         Building.query.options(
-            selectinload(Building.towers).selectinload(Tower.flats),
+            selectinload(Building.towers),
         )
         .filter_by(id=building_id)
         .first()
@@ -591,8 +680,12 @@ def get_tower_detail_service(building_id, tower_id):
     }, None
 
 
-def list_tower_flats_service(building_id, tower_id, status, page):
-    # Service: List flats for a tower with status filter and pagination.
+def list_tower_flats_service(building_id, tower_id, status, page, after=None, args=None):
+    # Service: List flats for a tower with status filter and page or keyset (after) pagination.
+    fieldset, errors = validate_fieldset_params(args or {}, FLAT_FIELDS, (), FLAT_LIST_FIELDSET)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
     try:
         page = int(page or 1)
     except (TypeError, ValueError):
@@ -604,6 +697,12 @@ def list_tower_flats_service(building_id, tower_id, status, page):
     if status not in (None, "", "all", "available", "true", "false"):
         return None, _error(400, "Validation Error", "status must be 'all', 'available', 'true', or 'false'.")
 
+    after_values = None
+    if after:
+        after_values = decode_keyset_cursor(after, FLAT_KEYSET_SORT)
+        if after_values is None:
+            return None, _error(400, "Validation Error", "after is invalid.")
+
     building = Building.query.filter_by(id=building_id).first()
     if not building:
         return None, _error(404, "Not Found", "Building not found.")
@@ -613,36 +712,308 @@ def list_tower_flats_service(building_id, tower_id, status, page):
         return None, _error(404, "Not Found", "Tower not found for this building.")
 
     per_page = 10
-    query = Flat.query.filter_by(tower_id=tower_id)
+    query = Flat.query.options(*_flat_load_options(fieldset)).filter_by(tower_id=tower_id)
     if status in ("available", "true"):
         query = query.filter_by(is_available=True)
     elif status == "false":
         query = query.filter_by(is_available=False)
 
-    total = query.count()
-    total_pages = (total + per_page - 1) // per_page
-    items = (
-        query.order_by(Flat.id.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
-    )
+    if after_values is not None:
+        items, has_more = _flat_keyset_page(query, after_values, per_page)
+        page = total = total_pages = None
+    else:
+        total = query.count()
+        total_pages = (total + per_page - 1) // per_page
+        items = (
+            query.order_by(Flat.id.desc())
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+        has_more = page < total_pages
+    next_cursor = encode_keyset_cursor(FLAT_KEYSET_SORT, [items[-1].id]) if has_more and items else None
 
     return {
         "status_code": 200,
         "message": "Flats fetched",
-        "data": serialize_flats_response(items, tower, building, page, per_page, total, total_pages),
+        "data": serialize_flats_response(
+            items, tower, building, page, per_page, total, total_pages, next_cursor, fieldset["fields"]
+        ),
     }, None
 
 
+def _flat_sort_order(sort):
+    columns, descending = FLAT_SORTS[sort]
+    return [column.desc() if descending else column.asc() for column in columns]
+
+
+def _flat_sort_values(flat, sort):
+    # JSON-safe keyset values of `flat` for `sort`; rents travel as strings to keep Decimal precision.
+    values = []
+    for column in FLAT_SORTS[sort][0]:
+        value = getattr(flat, column.key)
+        values.append(str(value) if isinstance(value, Decimal) else value)
+    return values
+
+
+def _decode_flat_sort_values(token, sort):
+    values = decode_keyset_cursor(token, sort)
+    if values is None or len(values) != len(FLAT_SORTS[sort][0]):
+        return None
+    try:
+        return [
+            Decimal(value) if column.key == "rent_amount" else int(value)
+            for column, value in zip(FLAT_SORTS[sort][0], values)
+        ]
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+
+def _flat_keyset_page(query, after_values, per_page, sort=FLAT_KEYSET_SORT):
+    # Keyset page in `sort` order: seeks past the last seen row instead of OFFSET, and skips the count.
+    columns, descending = FLAT_SORTS[sort]
+    rows = (
+        query.filter(keyset_after(list(columns), after_values, descending=descending))
+        .order_by(*_flat_sort_order(sort))
+        .limit(per_page + 1)
+        .all()
+    )
+    return rows[:per_page], len(rows) > per_page
+
+
+def _filter_by_address_match(query, search_address):
+    # Address as a plain filter (for explicit sorts): keeps buildings at or above the include threshold.
+    if sql_address_ranking_enabled():
+        address_scores = sql_address_scores(search_address)
+        return query.filter(Building.id.in_(select(address_scores.c.building_id)))
+    scores, _ = select_top_building_groups(
+        AddressScorer(search_address), _address_building_groups(query, search_address), None
+    )
+    return query.filter(Building.id.in_(list(scores)) if scores else db.false())
+
+
+def _address_building_groups(query, search_address):
+    # Streams (building id, address, matching flat count) for buildings that can match the address.
+    return (
+        filter_address_candidates(query, search_address)
+        .with_entities(Building.id, Building.address, func.count(Flat.id))
+        .group_by(Building.id, Building.address)
+        .yield_per(SEARCH_STREAM_BATCH_SIZE)
+    )
+
+
+def _hydrate_flat_rows(query, flat_ids):
+    rows_by_id = {row[0].id: row for row in query.filter(Flat.id.in_(flat_ids))}
+    return [rows_by_id[flat_id] for flat_id in flat_ids if flat_id in rows_by_id]
+
+
+def _blended_flat_ids_by_address(query, search_address, limit):
+    # Blended rank: building address score plus per-flat popularity and recency, computed in Python
+    # from the per-worker counters so the search query gains no joins. Buildings are only pruned
+    # once they cannot catch up even with the maximum boost, on either backend.
+    # Returns (ranked flat ids covering at least `limit` flats, total matching flats).
+    tuning = rank_tuning()
+    if sql_address_ranking_enabled():
+        address_scores = sql_address_scores(search_address)
+        if address_scores is None:
+            return [], 0
+        scored_groups = (
+            query.join(address_scores, address_scores.c.building_id == Building.id)
+            .with_entities(Building.id, address_scores.c.score, func.count(Flat.id))
+            .group_by(Building.id, address_scores.c.score)
+            .yield_per(SEARCH_STREAM_BATCH_SIZE)
+        )
+        building_scores, total = select_top_scored_groups(scored_groups, limit, slack=max_rank_boost(tuning))
+    else:
+        building_scores, total = select_top_building_groups(
+            AddressScorer(search_address),
+            _address_building_groups(query, search_address),
+            limit,
+            slack=max_rank_boost(tuning),
+        )
+    if not building_scores:
+        return [], total
+
+    rows = query.filter(Building.id.in_(list(building_scores))).with_entities(
+        Flat.id, Building.id, Flat.created_at
+    )
+    return rank_flats_blended(rows, building_scores, tuning), total
+
+
+def _rank_flats_blended(query, search_address, page, per_page):
+    ranked_ids, total = _blended_flat_ids_by_address(query, search_address, page * per_page)
+    page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+    return _hydrate_flat_rows(query, page_ids) if page_ids else [], total
+
+
+def _rank_flats_by_address(query, search_address, page, per_page):
+    # Phase 1: score each matching building once and keep only the best buildings
+    # needed to cover the first page * per_page flats.
+    building_scores, total = select_top_building_groups(
+        AddressScorer(search_address),
+        _address_building_groups(query, search_address),
+        page * per_page,
+    )
+    if not building_scores:
+        return [], total
+
+    # Phase 2: page flats in SQL, ordered by building score then newest flat.
+    paged_rows = (
+        query.filter(Building.id.in_(list(building_scores)))
+        .order_by(
+            case(building_scores, value=Building.id, else_=0.0).desc(),
+            Flat.id.desc(),
+        )
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    return paged_rows, total
+
+
+def _rank_flats_by_address_sql(query, search_address, page, per_page):
+    address_scores = sql_address_scores(search_address)
+    if address_scores is None:
+        return [], 0
+
+    ranked_query = query.join(address_scores, address_scores.c.building_id == Building.id)
+    total = ranked_query.count()
+    paged_rows = (
+        ranked_query.order_by(address_scores.c.score.desc(), Flat.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    return paged_rows, total
+
+
+def _ranked_flat_ids_by_address(query, search_address, limit):
+    # The first `limit` ranked flat ids of a search and the total match count, for a snapshot.
+    if blended_ranking_enabled():
+        ranked_ids, total = _blended_flat_ids_by_address(query, search_address, limit)
+        return ranked_ids[:limit], total
+    if sql_address_ranking_enabled():
+        address_scores = sql_address_scores(search_address)
+        if address_scores is None:
+            return [], 0
+        ranked_query = query.join(address_scores, address_scores.c.building_id == Building.id)
+        total = ranked_query.count()
+        ranked_query = ranked_query.order_by(address_scores.c.score.desc(), Flat.id.desc())
+    else:
+        building_scores, total = select_top_building_groups(
+            AddressScorer(search_address),
+            _address_building_groups(query, search_address),
+            limit,
+        )
+        if not building_scores:
+            return [], total
+        ranked_query = query.filter(Building.id.in_(list(building_scores))).order_by(
+            case(building_scores, value=Building.id, else_=0.0).desc(),
+            Flat.id.desc(),
+        )
+    return [flat_id for (flat_id,) in ranked_query.with_entities(Flat.id).limit(limit)], total
+
+
+def _rank_flats_from_snapshot(query, search_address, filters, page, per_page):
+    # Later pages hydrate only their ids from a cached ranked prefix. Returns (None, None) to stay on
+    # the top-k path: for page 1 without a current snapshot, and for pages past the snapshot cap.
+    key = snapshot_key(filters)
+    if page == 1 and not flat_search_snapshots.has(key):
+        return None, None
+    max_ids = flat_search_snapshots.max_ids()
+    if page * per_page > max_ids:
+        return None, None
+
+    version = current_catalog_version()
+    if blended_ranking_enabled() and rank_tuning()["popularity_weight"]:
+        # Popularity moves with every booking, so blended snapshots are also stamped with it.
+        version = (version, current_catalog_version(BOOKINGS_SCOPE))
+    snapshot = flat_search_snapshots.get(key, version)
+    if snapshot is None:
+        if page == 1:
+            return None, None
+        ranked_ids, total = _ranked_flat_ids_by_address(query, search_address, max_ids)
+        flat_search_snapshots.put(key, version, ranked_ids, total)
+    else:
+        ranked_ids, total = snapshot
+
+    page_ids = ranked_ids[(page - 1) * per_page:page * per_page]
+    if not page_ids:
+        return [], total
+
+    return _hydrate_flat_rows(query, page_ids), total
+
+
+def _rank_buildings_by_address(base_query, search_address, page, per_page, fieldset=BUILDING_LIST_FIELDSET):
+    building_rows = (
+        filter_address_candidates(base_query, search_address)
+        .with_entities(Building.id, Building.address)
+        .yield_per(SEARCH_STREAM_BATCH_SIZE)
+    )
+    ranked, total = select_top_buildings(
+        AddressScorer(search_address),
+        building_rows,
+        page * per_page,
+    )
+
+    page_ids = [building_id for _, building_id in ranked[(page - 1) * per_page:]]
+    if not page_ids:
+        return [], total
+
+    buildings_by_id = {
+        building.id: building
+        for building in Building.query.options(*_building_load_options(fieldset)).filter(Building.id.in_(page_ids))
+    }
+    return [buildings_by_id[building_id] for building_id in page_ids], total
+
+
+def _rank_buildings_by_address_sql(base_query, search_address, page, per_page, fieldset=BUILDING_LIST_FIELDSET):
+    address_scores = sql_address_scores(search_address)
+    if address_scores is None:
+        return [], 0
+
+    ranked_query = base_query.join(address_scores, address_scores.c.building_id == Building.id)
+    total = ranked_query.count()
+    page_buildings = (
+        ranked_query.options(*_building_load_options(fieldset))
+        .order_by(address_scores.c.score.desc(), Building.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+    return page_buildings, total
+
+
 def search_flats_service(args):
     # Service: Search flats across buildings by address, city, state, flat type, and rent range.
     params, errors = validate_flat_search_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+    fieldset, errors = validate_fieldset_params(args, FLAT_FIELDS, (), FLAT_LIST_FIELDSET)
     if errors:
         return None, _error(400, "Validation Error", " ".join(errors))
 
+    if params["cursor"]:
+        filters = decode_search_cursor(params["cursor"])
+        if filters is None:
+            return None, _error(400, "Validation Error", "cursor is invalid or expired.")
+        params.update(filters)
+        params["min_rent"] = Decimal(filters["min_rent"]) if filters["min_rent"] is not None else None
+        params["max_rent"] = Decimal(filters["max_rent"]) if filters["max_rent"] is not None else None
+        params["amenities"] = filters["amenities"] or []
+        params["amenities_match"] = filters["amenities_match"] or "all"
+
+    sort = params["sort"]
+    after_values = None
+    if params["after"]:
+        after_values = _decode_flat_sort_values(params["after"], sort)
+        if after_values is None:
+            return None, _error(400, "Validation Error", "after is invalid for this sort.")
+
     page = params["page"]
     per_page = params["per_page"]
+    cursor = None
+    next_cursor = None
 
     query = (
         db.session.query(Flat, Tower, Building)
@@ -654,9 +1025,9 @@ def search_flats_service(args):
         query = query.filter(Flat.is_available.is_(True))
 
     if params["city"]:
-        query = query.filter(Building.city.ilike(f"%{params['city']}%"))
+        query = filter_by_location(query, Building.city, Building.city_id, "city", params["city"])
     if params["state"]:
-        query = query.filter(Building.state.ilike(f"%{params['state']}%"))
+        query = filter_by_location(query, Building.state, Building.state_id, "state", params["state"])
     if params["flat_type"]:
         query = query.filter(Flat.bhk_type.ilike(f"%{params['flat_type']}%"))
 
@@ -665,43 +1036,246 @@ def search_flats_service(args):
     if params["max_rent"] is not None:
         query = query.filter(Flat.rent_amount <= params["max_rent"])
 
-    if params["address"]:
-        min_include = _search_tuning()["min_include"]
-        rows = query.all()
-        scored_rows = []
-        for flat, tower, building in rows:
-            score = _address_word_match_score(params["address"], building.address)
-            if score < min_include:
-                continue
-            scored_rows.append((score, flat, tower, building))
-
-        scored_rows.sort(key=lambda item: (-item[0], -item[1].id))
-
-        total = len(scored_rows)
+    distances = None
+    if params["near"]:
+        distances = buildings_within_radius(params["near"][0], params["near"][1], params["radius_km"])
+        query = query.filter(Building.id.in_(list(distances)) if distances else db.false())
+
+    if params["amenities"]:
+        query = query.filter(flat_amenities_condition(params["amenities"], params["amenities_match"]))
+
+    facets = None
+    if params["facets"]:
+        facets = flat_search_facets(query, params["facets"], params["address"])
+
+    if params["address"] and sort != "relevance":
+        query = _filter_by_address_match(query, params["address"])
+
+    if sort == "relevance":
+        filters = normalize_search_filters(params)
+        cursor = encode_search_cursor(filters)
+        paged_rows, total = _rank_flats_from_snapshot(query, params["address"], filters, page, per_page)
+        if paged_rows is None:
+            if blended_ranking_enabled():
+                paged_rows, total = _rank_flats_blended(query, params["address"], page, per_page)
+            elif sql_address_ranking_enabled():
+                paged_rows, total = _rank_flats_by_address_sql(query, params["address"], page, per_page)
+            else:
+                paged_rows, total = _rank_flats_by_address(query, params["address"], page, per_page)
         total_pages = (total + per_page - 1) // per_page if total else 0
-        start = (page - 1) * per_page
-        end = start + per_page
-        paged_rows = [(flat, tower, building) for _, flat, tower, building in scored_rows[start:end]]
     else:
-        total = query.count()
-        total_pages = (total + per_page - 1) // per_page
-        paged_rows = (
-            query.order_by(Flat.id.desc())
-            .offset((page - 1) * per_page)
-            .limit(per_page)
-            .all()
-        )
+        # Explicit sorts page straight off this query, so only the requested flat columns are loaded.
+        query = query.options(*_flat_load_options(fieldset, *FLAT_SORTS[sort][0]))
+        if after_values is not None:
+            paged_rows, has_more = _flat_keyset_page(query, after_values, per_page, sort)
+            page = total = total_pages = None
+        else:
+            total = query.count()
+            total_pages = (total + per_page - 1) // per_page
+            paged_rows = (
+                query.order_by(*_flat_sort_order(sort))
+                .offset((page - 1) * per_page)
+                .limit(per_page)
+                .all()
+            )
+            has_more = page < total_pages
+        if has_more and paged_rows:
+            next_cursor = encode_keyset_cursor(sort, _flat_sort_values(paged_rows[-1][0], sort))
 
     return {
         "status_code": 200,
         "message": "Flat search results fetched",
-        "data": serialize_flat_search_response(paged_rows, page, per_page, total, total_pages),
+        "data": serialize_flat_search_response(
+            paged_rows,
+            page,
+            per_page,
+            total,
+            total_pages,
+            cursor,
+            next_cursor,
+            facets,
+            distances,
+            fieldset["fields"],
+        ),
+    }, None
+
+
+def suggest_service(args):
+    # Service: Autocomplete building names, cities, states and localities from the per-worker prefix index.
+    params, errors = validate_suggest_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    return {
+        "status_code": 200,
+        "message": "Suggestions fetched",
+        "data": {
+            "q": params["q"],
+            "items": building_suggestions.get().suggest(params["q"], params["limit"]),
+        },
+    }, None
+
+
+def similar_flats_service(flat_id, args):
+    # Service: Recommend available flats closest to the given flat in the per-worker feature matrix.
+    params, errors = validate_similar_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+    fieldset, errors = validate_fieldset_params(args, FLAT_FIELDS, (), FLAT_LIST_FIELDSET)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    features = similar_flat_features(flat_id)
+    if features is None:
+        return None, _error(404, "Not Found", "Flat not found.")
+
+    nearest = flat_feature_matrix.get().nearest(features, params["limit"], exclude_flat_id=flat_id)
+    distances = dict(nearest)
+    rows_by_id = {}
+    if distances:
+        rows_by_id = {
+            flat.id: (flat, tower, building)
+            for flat, tower, building in db.session.query(Flat, Tower, Building)
+            .options(*_flat_load_options(fieldset))
+            .join(Tower, Tower.id == Flat.tower_id)
+            .join(Building, Building.id == Tower.building_id)
+            .filter(Flat.id.in_(list(distances)))
+        }
+
+    return {
+        "status_code": 200,
+        "message": "Similar flats fetched",
+        "data": serialize_similar_flats_response(
+            flat_id,
+            [rows_by_id[similar_id] for similar_id, _ in nearest if similar_id in rows_by_id],
+            distances,
+            fieldset["fields"],
+        ),
+    }, None
+
+
+def create_saved_search_service(identity, payload):
+    # Service: Save flat search filters so new or changed flats matching them land in a feed.
+    user = _get_user_by_identity(identity)
+    if not user:
+        return None, _error(401, "Unauthorized", "Invalid token.")
+
+    payload, errors = validate_saved_search_payload(payload)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    if SavedSearch.query.filter_by(user_id=user.id).count() >= SAVED_SEARCH_MAX_PER_USER:
+        return None, _error(409, "Conflict", f"You can save at most {SAVED_SEARCH_MAX_PER_USER} searches.")
+
+    saved_search = SavedSearch(user_id=user.id, name=payload["name"], filters=payload["filters"])
+    db.session.add(saved_search)
+    bump_catalog_version(SAVED_SEARCHES_SCOPE)
+    db.session.commit()
+    search_id, filters = saved_search.id, saved_search.filters
+    saved_search_index.apply(lambda index: index.add(search_id, filters))
+
+    return {
+        "status_code": 201,
+        "message": "Saved search created",
+        "data": serialize_saved_search(saved_search),
+    }, None
+
+
+def list_saved_searches_service(identity):
+    # Service: List the user's saved searches with their match counts.
+    user = _get_user_by_identity(identity)
+    if not user:
+        return None, _error(401, "Unauthorized", "Invalid token.")
+
+    saved_searches = SavedSearch.query.filter_by(user_id=user.id).order_by(SavedSearch.id.desc()).all()
+    match_counts = dict(
+        db.session.query(SavedSearchMatch.saved_search_id, func.count(SavedSearchMatch.id))
+        .join(SavedSearch, SavedSearch.id == SavedSearchMatch.saved_search_id)
+        .filter(SavedSearch.user_id == user.id)
+        .group_by(SavedSearchMatch.saved_search_id)
+        .all()
+    )
+
+    return {
+        "status_code": 200,
+        "message": "Saved searches fetched",
+        "data": [
+            serialize_saved_search(saved_search, match_counts.get(saved_search.id, 0))
+            for saved_search in saved_searches
+        ],
+    }, None
+
+
+def delete_saved_search_service(identity, saved_search_id):
+    # Service: Delete one of the user's saved searches and its match feed.
+    user = _get_user_by_identity(identity)
+    if not user:
+        return None, _error(401, "Unauthorized", "Invalid token.")
+
+    saved_search = SavedSearch.query.filter_by(id=saved_search_id, user_id=user.id).first()
+    if not saved_search:
+        return None, _error(404, "Not Found", "Saved search not found.")
+
+    db.session.delete(saved_search)
+    bump_catalog_version(SAVED_SEARCHES_SCOPE)
+    db.session.commit()
+    saved_search_index.apply(lambda index: index.remove(saved_search_id))
+
+    return {
+        "status_code": 200,
+        "message": "Saved search deleted",
+        "data": {"id": saved_search_id},
+    }, None
+
+
+def list_saved_search_matches_service(identity, saved_search_id, args):
+    # Service: Feed of flats that matched a saved search when listed or changed, newest first.
+    user = _get_user_by_identity(identity)
+    if not user:
+        return None, _error(401, "Unauthorized", "Invalid token.")
+
+    params, errors = validate_saved_search_matches_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
+    after_values = None
+    if params["after"]:
+        after_values = decode_keyset_cursor(params["after"], SAVED_SEARCH_MATCHES_SORT)
+        if after_values is None:
+            return None, _error(400, "Validation Error", "after is invalid.")
+
+    saved_search = SavedSearch.query.filter_by(id=saved_search_id, user_id=user.id).first()
+    if not saved_search:
+        return None, _error(404, "Not Found", "Saved search not found.")
+
+    per_page = params["per_page"]
+    query = (
+        db.session.query(SavedSearchMatch, Flat, Tower, Building)
+        .join(Flat, Flat.id == SavedSearchMatch.flat_id)
+        .join(Tower, Tower.id == Flat.tower_id)
+        .join(Building, Building.id == Tower.building_id)
+        .filter(SavedSearchMatch.saved_search_id == saved_search.id)
+    )
+    if after_values is not None:
+        query = query.filter(keyset_after([SavedSearchMatch.id], after_values, descending=True))
+    rows = query.order_by(SavedSearchMatch.id.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_keyset_cursor(SAVED_SEARCH_MATCHES_SORT, [rows[-1][0].id]) if has_more else None
+
+    return {
+        "status_code": 200,
+        "message": "Saved search matches fetched",
+        "data": serialize_saved_search_matches_response(saved_search, rows, per_page, next_cursor),
     }, None
 
 
 def search_buildings_service(args):
     # Service: Search buildings by name/address/city/state with pagination.
     params, errors = validate_building_search_params(args)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+    fieldset, errors = validate_fieldset_params(args, BUILDING_FIELDS, BUILDING_INCLUDES, BUILDING_LIST_FIELDSET)
     if errors:
         return None, _error(400, "Validation Error", " ".join(errors))
 
@@ -712,41 +1286,23 @@ def search_buildings_service(args):
     if params["name"]:
         base_query = base_query.filter(Building.name.ilike(f"%{params['name']}%"))
     if params["city"]:
-        base_query = base_query.filter(Building.city.ilike(f"%{params['city']}%"))
+        base_query = filter_by_location(base_query, Building.city, Building.city_id, "city", params["city"])
     if params["state"]:
-        base_query = base_query.filter(Building.state.ilike(f"%{params['state']}%"))
+        base_query = filter_by_location(base_query, Building.state, Building.state_id, "state", params["state"])
 
     if params["address"]:
-        min_include = _search_tuning()["min_include"]
-        buildings = (
-            base_query.options(
-                selectinload(Building.towers).selectinload(Tower.flats),
-                selectinload(Building.amenities),
-            ).all()
-        )
-
-        scored_buildings = []
-        for building in buildings:
-            score = _address_word_match_score(params["address"], building.address)
-            if score < min_include:
-                continue
-            scored_buildings.append((score, building))
-
-        scored_buildings.sort(key=lambda item: (-item[0], -item[1].id))
-
-        total = len(scored_buildings)
+        if sql_address_ranking_enabled():
+            page_buildings, total = _rank_buildings_by_address_sql(
+                base_query, params["address"], page, per_page, fieldset
+            )
+        else:
+            page_buildings, total = _rank_buildings_by_address(base_query, params["address"], page, per_page, fieldset)
         total_pages = (total + per_page - 1) // per_page if total else 0
-        start = (page - 1) * per_page
-        end = start + per_page
-        page_buildings = [building for _, building in scored_buildings[start:end]]
     else:
         total = base_query.count()
         total_pages = (total + per_page - 1) // per_page
         page_buildings = (
-            base_query.options(
-                selectinload(Building.towers).selectinload(Tower.flats),
-                selectinload(Building.amenities),
-            )
+            base_query.options(*_building_load_options(fieldset))
             .order_by(Building.id.desc())
             .offset((page - 1) * per_page)
             .limit(per_page)
@@ -756,12 +1312,16 @@ def search_buildings_service(args):
     return {
         "status_code": 200,
         "message": "Building search results fetched",
-        "data": serialize_building_search_response(page_buildings, page, per_page, total, total_pages),
+        "data": serialize_building_search_response(page_buildings, page, per_page, total, total_pages, fieldset),
     }, None
 
 
-def get_flat_detail_service(building_id, tower_id, flat_id):
+def get_flat_detail_service(building_id, tower_id, flat_id, args=None):
     # Service: Fetch a single flat with tower, building, and amenities info.
+    fieldset, errors = validate_fieldset_params(args or {}, FLAT_FIELDS, FLAT_INCLUDES, FLAT_DETAIL_FIELDSET)
+    if errors:
+        return None, _error(400, "Validation Error", " ".join(errors))
+
     building = Building.query.filter_by(id=building_id).first()
     if not building:
         return None, _error(404, "Not Found", "Building not found.")
@@ -770,14 +1330,14 @@ def get_flat_detail_service(building_id, tower_id, flat_id):
     if not tower:
         return None, _error(404, "Not Found", "Tower not found for this building.")
 
-    flat = Flat.query.filter_by(id=flat_id, tower_id=tower_id).first()
+    flat = Flat.query.options(*_flat_load_options(fieldset)).filter_by(id=flat_id, tower_id=tower_id).first()
     if not flat:
         return None, _error(404, "Not Found", "Flat not found for this tower.")
 
     return {
         "status_code": 200,
         "message": "Flat fetched",
-        "data": serialize_flat_detail(flat, tower, building),
+        "data": serialize_flat_detail(flat, tower, building, fieldset),
     }, None
 
 
@@ -785,7 +1345,7 @@ def list_building_towers_service(building_id):
     # Service: List towers for a building with flat counts.
     building = (
         Building.query.options(
-            selectinload(Building.towers).selectinload(Tower.flats),
+            selectinload(Building.towers),
         )
         .filter_by(id=building_id)
         .first()
@@ -840,7 +1400,9 @@ def create_security_deposit_booking_service(identity, flat_id):
     )
 
     db.session.add(booking)
+    count_booking_activity(booking, bookings=1)
     db.session.commit()
+    refresh_booking_popularity(booking, bookings=1)
 
     return {
         "status_code": 201,
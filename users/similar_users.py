@@ -0,0 +1,222 @@
+import math
+import re
+import threading
+import zlib
+from extensions import db
+from admins.models_admins import Amenity, Building, Flat, Tower, flat_amenities
+from common.catalog_version import FLATS_SCOPE, CatalogVersionedIndex
+from users.amenities_users import normalize_amenity_name
+import numpy as np
+
+
+SIMILAR_DEFAULT_LIMIT = 10
+SIMILAR_MAX_LIMIT = 50
+SIMILAR_INITIAL_CAPACITY = 1024
+AMENITY_MASK_BITS = 64
+
+# Weighted L1 over normalized features: rent and area as relative differences to the source flat,
+# BHK as whole rooms, floors in tens, a flat penalty for another city, and Jaccard distance on
+# amenity names.
+SIMILAR_WEIGHTS = {
+    "rent": 3.0,
+    "area": 2.0,
+    "bhk": 1.0,
+    "floor": 0.1,
+    "city": 2.0,
+    "amenities": 1.0,
+}
+FEATURE_COLUMNS = ("rent", "area", "bhk", "floor")
+
+
+def bhk_rooms(bhk_type):
+    match = re.search(r"\d+(?:\.\d+)?", str(bhk_type or ""))
+    return float(match.group()) if match else 0.0
+
+
+def amenity_mask(names):
+    # Names hash onto a fixed 64-bit mask so the matrix column stays a single uint64; collisions
+    # only make two amenities look shared.
+    mask = 0
+    for name in names:
+        mask |= 1 << (zlib.crc32(normalize_amenity_name(name).encode("utf-8")) % AMENITY_MASK_BITS)
+    return mask
+
+
+def flat_features(rent, area, bhk_type, floor, city_id, amenity_names):
+    return {
+        "rent": float(rent or 0),
+        "area": float(area or 0),
+        "bhk": bhk_rooms(bhk_type),
+        "floor": float(floor or 0),
+        "city": city_id if city_id is not None else -1,
+        "mask": amenity_mask(amenity_names),
+    }
+
+
+class FlatFeatureMatrix:
+    # One row per flat, stored column-wise. Rows are written in place on admin writes and freed
+    # rows are reused, so a change never rebuilds the matrix. Only available flats are candidates.
+    def __init__(self, capacity=SIMILAR_INITIAL_CAPACITY):
+        self._rows = {}
+        self._free = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._columns = {name: np.zeros(capacity, dtype=np.float64) for name in FEATURE_COLUMNS}
+        self._columns.update(
+            city=np.full(capacity, -1, dtype=np.int64),
+            mask=np.zeros(capacity, dtype=np.uint64),
+            flat_id=np.zeros(capacity, dtype=np.int64),
+        )
+        self._active = np.zeros(capacity, dtype=bool)
+        self._capacity = capacity
+
+    def _grow(self):
+        old_columns, old_active, old_capacity = self._columns, self._active, self._capacity
+        self._allocate(old_capacity * 2)
+        for name, column in old_columns.items():
+            self._columns[name][:old_capacity] = column
+        self._active[:old_capacity] = old_active
+
+    def __len__(self):
+        return len(self._rows)
+
+    def set_flat(self, flat_id, features, is_available):
+        with self._lock:
+            row = self._rows.get(flat_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == self._capacity:
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[flat_id] = row
+            for name in FEATURE_COLUMNS:
+                self._columns[name][row] = features[name]
+            self._columns["city"][row] = features["city"]
+            self._columns["mask"][row] = features["mask"]
+            self._columns["flat_id"][row] = flat_id
+            self._active[row] = bool(is_available)
+
+    def remove_flat(self, flat_id):
+        with self._lock:
+            row = self._rows.pop(flat_id, None)
+            if row is not None:
+                self._active[row] = False
+                self._free.append(row)
+
+    def nearest(self, features, limit, exclude_flat_id=None):
+        # Returns [(flat_id, distance)] ordered by distance, then flat id.
+        with self._lock:
+            return self._nearest_numpy(features, limit, exclude_flat_id)
+
+    def _nearest_numpy(self, features, limit, exclude_flat_id):
+        size = self._size
+        columns = self._columns
+        distances = SIMILAR_WEIGHTS["rent"] / max(features["rent"], 1.0) * np.abs(
+            columns["rent"][:size] - features["rent"]
+        )
+        distances += SIMILAR_WEIGHTS["area"] / max(features["area"], 1.0) * np.abs(
+            columns["area"][:size] - features["area"]
+        )
+        distances += SIMILAR_WEIGHTS["bhk"] * np.abs(columns["bhk"][:size] - features["bhk"])
+        distances += SIMILAR_WEIGHTS["floor"] / 10 * np.abs(columns["floor"][:size] - features["floor"])
+        distances += SIMILAR_WEIGHTS["city"] * (columns["city"][:size] != features["city"])
+
+        masks = columns["mask"][:size]
+        wanted = np.uint64(features["mask"])
+        union = np.bitwise_count(masks | wanted).astype(np.float64)
+        shared = np.bitwise_count(masks & wanted).astype(np.float64)
+        jaccard = np.divide(shared, union, out=np.ones(size), where=union > 0)
+        distances += SIMILAR_WEIGHTS["amenities"] * (1.0 - jaccard)
+
+        candidates = self._active[:size].copy()
+        if exclude_flat_id is not None and exclude_flat_id in self._rows:
+            candidates[self._rows[exclude_flat_id]] = False
+        candidate_rows = np.flatnonzero(candidates)
+        if not len(candidate_rows):
+            return []
+
+        limit = min(limit, len(candidate_rows))
+        candidate_distances = distances[candidate_rows]
+        if limit < len(candidate_rows):
+            picked = np.argpartition(candidate_distances, limit - 1)[:limit]
+        else:
+            picked = np.arange(len(candidate_rows))
+        flat_ids = columns["flat_id"][candidate_rows[picked]]
+        picked_distances = candidate_distances[picked]
+        order = np.lexsort((flat_ids, picked_distances))
+        return [(int(flat_ids[i]), float(picked_distances[i])) for i in order]
+
+
+def _flat_feature_rows(flat_ids=None):
+    # Yields (flat_id, features, is_available) straight from the tables, without loading ORM objects.
+    flats = (
+        db.session.query(
+            Flat.id,
+            Flat.rent_amount,
+            Flat.area_sqft,
+            Flat.bhk_type,
+            Flat.floor_number,
+            Flat.is_available,
+            Building.city_id,
+        )
+        .join(Tower, Tower.id == Flat.tower_id)
+        .join(Building, Building.id == Tower.building_id)
+    )
+    names = db.session.query(flat_amenities.c.flat_id, Amenity.name).join(
+        Amenity, Amenity.id == flat_amenities.c.amenity_id
+    )
+    if flat_ids is not None:
+        flats = flats.filter(Flat.id.in_(flat_ids))
+        names = names.filter(flat_amenities.c.flat_id.in_(flat_ids))
+
+    amenity_names = {}
+    for flat_id, name in names:
+        amenity_names.setdefault(flat_id, []).append(name)
+    for flat_id, rent, area, bhk_type, floor, is_available, city_id in flats:
+        features = flat_features(rent, area, bhk_type, floor, city_id, amenity_names.get(flat_id, ()))
+        yield flat_id, features, is_available
+
+
+def _build_flat_feature_matrix():
+    count = db.session.query(db.func.count(Flat.id)).scalar() or 0
+    matrix = FlatFeatureMatrix(max(SIMILAR_INITIAL_CAPACITY, 1 << math.ceil(math.log2(count + 1))))
+    for flat_id, features, is_available in _flat_feature_rows():
+        matrix.set_flat(flat_id, features, is_available)
+    return matrix
+
+
+flat_feature_matrix = CatalogVersionedIndex(
+    _build_flat_feature_matrix,
+    scope=FLATS_SCOPE,
+    invalidate_on_write=False,
+)
+
+
+def similar_flat_features(flat_id):
+    rows = list(_flat_feature_rows([flat_id]))
+    return rows[0][1] if rows else None
+
+
+def refresh_similar_flats(flat_ids):
+    # Called after an admin write commits with every flat whose features may have changed; flats
+    # that no longer exist drop out of the matrix.
+    flat_ids = list(flat_ids)
+    if not flat_ids:
+        return
+
+    def update(matrix):
+        seen = set()
+        for flat_id, features, is_available in _flat_feature_rows(flat_ids):
+            matrix.set_flat(flat_id, features, is_available)
+            seen.add(flat_id)
+        for flat_id in flat_ids:
+            if flat_id not in seen:
+                matrix.remove_flat(flat_id)
+
+    flat_feature_matrix.apply(update)
@@ -0,0 +1,177 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from extensions import db
+from admins.models_admins import Building
+from common.catalog_version import BUILDINGS_SCOPE, CatalogVersionedIndex
+from users.search_users import tokenize_words
+
+
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_MEMO_SIZE = 4096
+
+
+def normalize_suggest_text(value):
+    return " ".join(tokenize_words(value))
+
+
+def _word_suffixes(text):
+    # "prestige lake view" is reachable as "prestige...", "lake..." and "view...".
+    words = text.split()
+    return {" ".join(words[index:]) for index in range(len(words))}
+
+
+def _building_contributions(building_id, name, city, state, address):
+    # Returns {entry: (label, keys)} for one building. Entries other than the building itself are
+    # shared, so their weight is the number of buildings contributing them.
+    contributions = {}
+
+    def add(kind, label, owner_id=None):
+        text = normalize_suggest_text(label)
+        if text:
+            contributions[(kind, text, owner_id)] = (label.strip(), _word_suffixes(text))
+
+    add("building", name or "", building_id)
+    add("city", city or "")
+    add("state", state or "")
+    for token in set(tokenize_words(address)):
+        if not token.isdigit():
+            add("locality", token)
+    return contributions
+
+
+class SuggestionIndex:
+    # Sorted array of normalized keys searched with bisect; each key maps to the entries it
+    # reaches. Buildings are added and removed individually so admin writes patch it in place.
+    # Ranked answers are memoized per prefix; a write only drops the prefixes of keys it touched,
+    # which are the only prefixes whose ranking it can change.
+    def __init__(self):
+        self._keys = []
+        self._key_entries = {}
+        self._labels = {}
+        self._weights = Counter()
+        self._building_entries = {}
+        self._memo = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _forget_prefixes(self, keys):
+        if not self._memo:
+            return
+        for key in keys:
+            for end in range(1, len(key) + 1):
+                self._memo.pop(key[:end], None)
+
+    def upsert_building(self, building_id, name, city, state, address):
+        with self._lock:
+            self._remove_building(building_id)
+            self._add_building(building_id, name, city, state, address)
+
+    def remove_building(self, building_id):
+        with self._lock:
+            self._remove_building(building_id)
+
+    def _add_building(self, building_id, name, city, state, address):
+        contributions = _building_contributions(building_id, name, city, state, address)
+        for entry, (label, keys) in contributions.items():
+            self._weights[entry] += 1
+            self._labels[entry] = label
+            for key in keys:
+                entries = self._key_entries.get(key)
+                if entries is None:
+                    entries = self._key_entries[key] = Counter()
+                    insort(self._keys, key)
+                entries[entry] += 1
+            self._forget_prefixes(keys)
+        self._building_entries[building_id] = {entry: keys for entry, (_, keys) in contributions.items()}
+
+    def _remove_building(self, building_id):
+        for entry, keys in self._building_entries.pop(building_id, {}).items():
+            self._forget_prefixes(keys)
+            self._weights[entry] -= 1
+            if self._weights[entry] <= 0:
+                del self._weights[entry]
+                del self._labels[entry]
+            for key in keys:
+                entries = self._key_entries[key]
+                entries[entry] -= 1
+                if entries[entry] <= 0:
+                    del entries[entry]
+                if not entries:
+                    del self._key_entries[key]
+                    del self._keys[bisect_left(self._keys, key)]
+
+    def suggest(self, query, limit=SUGGEST_DEFAULT_LIMIT):
+        prefix = normalize_suggest_text(query)
+        if not prefix:
+            return []
+
+        with self._lock:
+            ranked = self._memo.get(prefix)
+            if ranked is None:
+                ranked = self._rank(prefix)
+                self._memo[prefix] = ranked
+                while len(self._memo) > SUGGEST_MEMO_SIZE:
+                    self._memo.popitem(last=False)
+            else:
+                self._memo.move_to_end(prefix)
+        return ranked[:limit]
+
+    def _rank(self, prefix):
+        # Rank: whole-key matches first, then entries shared by more buildings, then shorter labels.
+        best = {}
+        keys = self._keys
+        index = bisect_left(keys, prefix)
+        while index < len(keys) and keys[index].startswith(prefix):
+            key = keys[index]
+            exact = key == prefix
+            for entry in self._key_entries[key]:
+                if exact or entry not in best:
+                    best[entry] = exact
+            index += 1
+
+        ranked = heapq.nsmallest(
+            SUGGEST_MAX_LIMIT,
+            best.items(),
+            key=lambda item: (not item[1], -self._weights[item[0]], len(self._labels[item[0]]), item[0][1]),
+        )
+        return [
+            {
+                "type": kind,
+                "text": self._labels[(kind, text, building_id)],
+                "building_id": building_id,
+                "count": self._weights[(kind, text, building_id)],
+            }
+            for (kind, text, building_id), _ in ranked
+        ]
+
+
+def _build_suggestion_index():
+    index = SuggestionIndex()
+    rows = db.session.query(
+        Building.id, Building.name, Building.city, Building.state, Building.address
+    ).yield_per(500)
+    for row in rows:
+        index.upsert_building(*row)
+    return index
+
+
+building_suggestions = CatalogVersionedIndex(
+    _build_suggestion_index,
+    scope=BUILDINGS_SCOPE,
+    invalidate_on_write=False,
+)
+
+
+def refresh_building_suggestions(building):
+    # Called after an admin write commits, so this worker serves the change without a rebuild.
+    building_suggestions.apply(
+        lambda index: index.upsert_building(
+            building.id, building.name, building.city, building.state, building.address
+        )
+    )
+
+
+def remove_building_suggestions(building_id):
+    building_suggestions.apply(lambda index: index.remove_building(building_id))